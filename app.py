@@ -5,9 +5,40 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
+import csv
+import glob
+import gzip
+import hashlib
 import io
+import json
+import os
 import re
+import tempfile
+import threading
+import time
+import unicodedata
+import zipfile
 import requests
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+try:
+    import ahocorasick
+except ImportError:  # Dependência opcional: sem ela, cada termo da busca varre o vocabulário separadamente
+    ahocorasick = None
+
+try:
+    from scipy import sparse
+except ImportError:  # Dependência opcional: sem ela, a busca por editais semelhantes fica indisponível
+    sparse = None
+
+# Copy-on-Write: operações derivadas nunca alteram a base compartilhada entre sessões
+# (padrão a partir do pandas 3)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
 
 # Configuração da página
 st.set_page_config(
@@ -131,222 +162,2103 @@ SHAREPOINT_URL = "https://tcerj365-my.sharepoint.com/:x:/g/personal/emanuellipc_
 # Tentativa de conversão para download direto
 SHAREPOINT_CSV_URL = "https://tcerj365-my.sharepoint.com/:x:/g/personal/emanuellipc_tcerj_tc_br/EapYf2FOUAZKhwemlND9-yABORDNXmUQrevxWZHffU2wSg?e=gwyMcP&download=1"
 
-@st.cache_data(ttl=300)  # Cache por 5 minutos
-def load_data_from_sharepoint():
-    """Carrega dados diretamente do SharePoint"""
+# Diretório dos snapshots colunares da base já tratada
+SNAPSHOT_DIR = os.environ.get('CIC_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'cic2025_snapshots'))
+# Versão do tratamento dos dados - alterar invalida os snapshots existentes
+SNAPSHOT_SCHEMA_VERSION = 4
+# Quantidade de snapshots mantidos em disco
+SNAPSHOT_KEEP = 3
+# Tamanho dos blocos do download em streaming (1 MB)
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+def snapshot_key_for(content_digest):
+    """Gera a chave do snapshot a partir do hash do conteúdo baixado da planilha"""
+    signature = hashlib.sha1(f"{content_digest}|schema={SNAPSHOT_SCHEMA_VERSION}".encode('utf-8'))
+    return signature.hexdigest()[:16]
+
+def snapshot_path(snapshot_key):
+    """Caminho do arquivo de snapshot correspondente à chave"""
+    return os.path.join(SNAPSHOT_DIR, f"editais_{snapshot_key}.feather")
+
+@st.cache_resource(show_spinner=False)
+def get_http_session():
+    """Sessão HTTP compartilhada, reaproveitando as conexões entre atualizações"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=2)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def load_fetch_state():
+    """Lê os validadores HTTP (ETag/Last-Modified) da última versão baixada de cada URL"""
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, 'fetch_state.json'), encoding='utf-8') as state_file:
+            return json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+
+def save_fetch_state(state):
+    """Grava os validadores HTTP de forma atômica"""
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        path = os.path.join(SNAPSHOT_DIR, 'fetch_state.json')
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as state_file:
+            json.dump(state, state_file)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+def fetch_remote_csv(url, session=None, timeout=30, revalidate=True):
+    """Baixa a planilha com revalidação condicional e download em streaming para arquivo temporário
+    
+    Retorna (snapshot_key, caminho_do_csv). Quando o servidor responde 304 (não modificado),
+    o caminho é None e a chave aponta para o snapshot já existente.
+    """
+    session = session or get_http_session()
+    state = load_fetch_state()
+    validators = state.get(url, {})
+    
+    # Só revalida se o snapshot da última versão ainda estiver em disco
+    headers = {}
+    known_key = validators.get('snapshot_key')
+    if revalidate and known_key and os.path.exists(snapshot_path(known_key)):
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304 and headers:
+            return known_key, None
+        response.raise_for_status()
+        
+        # Grava o corpo em blocos, calculando o hash do conteúdo durante o download
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        signature = hashlib.sha1()
+        temp_file = tempfile.NamedTemporaryFile(dir=SNAPSHOT_DIR, suffix='.csv', delete=False)
+        try:
+            with temp_file:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    signature.update(chunk)
+                    temp_file.write(chunk)
+        except Exception:
+            os.remove(temp_file.name)
+            raise
+        
+        snapshot_key = snapshot_key_for(signature.hexdigest())
+        state[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'snapshot_key': snapshot_key
+        }
+    
+    save_fetch_state(state)
+    return snapshot_key, temp_file.name
+
+def load_snapshot(snapshot_key):
+    """Lê o snapshot da base tratada mapeando o arquivo em memória, se existir"""
+    path = snapshot_path(snapshot_key)
+    if not os.path.exists(path):
+        return None
+    
+    try:
+        return feather.read_table(path, memory_map=True).to_pandas()
+    except Exception:
+        # Snapshot corrompido ou incompatível - será regenerado
+        return None
+
+def save_snapshot(df, snapshot_key):
+    """Grava a base tratada como snapshot colunar tipado (Feather/Arrow, sem compressão)"""
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        path = snapshot_path(snapshot_key)
+        
+        # Escrita atômica para não expor snapshots incompletos
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        feather.write_feather(df, temp_path, compression='uncompressed')
+        os.replace(temp_path, path)
+        prune_snapshots()
+    except Exception:
+        # Falha ao gravar o snapshot não impede o uso dos dados
+        pass
+
+def prune_snapshots():
+    """Mantém em disco apenas os snapshots mais recentes"""
+    snapshots = sorted(
+        glob.glob(os.path.join(SNAPSHOT_DIR, 'editais_*.feather')),
+        key=os.path.getmtime,
+        reverse=True
+    )
+    for old_path in snapshots[SNAPSHOT_KEEP:]:
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass
+
+def compute_dataset_version(df, row_hashes=None):
+    """Gera uma assinatura do conteúdo do dataframe, usada como chave dos caches e índices
+    
+    'row_hashes' permite reaproveitar hashes das linhas já calculados.
+    """
+    if row_hashes is None:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).values
+    signature = hashlib.sha1(row_hashes.tobytes())
+    signature.update('|'.join(map(str, df.columns)).encode('utf-8'))
+    return signature.hexdigest()[:16]
+
+def _open_csv_source(source):
+    """Abre a origem do CSV (caminho em disco ou conteúdo em bytes) como arquivo binário"""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return open(source, 'rb')
+
+def _read_csv_header(stream, encoding, escapechar=None):
+    """Lê apenas a linha de cabeçalho do CSV, sem o BOM (como fazem os leitores colunares)"""
+    first_line = stream.readline().decode('utf-8-sig' if encoding.lower() in ('utf-8', 'utf8') else encoding)
+    return next(csv.reader([first_line], escapechar=escapechar), [])
+
+def _read_csv_pyarrow(source, encoding, escapechar, report):
+    """Leitura multithread pelo pyarrow, com todas as colunas declaradas como texto"""
+    with _open_csv_source(source) as stream:
+        header = _read_csv_header(stream, encoding, escapechar)
+    if len(set(header)) != len(header):
+        raise ValueError("cabeçalho com colunas repetidas")
+    
+    recovered_rows = []
+    
+    def handle_invalid_row(row):
+        if row.actual_columns < row.expected_columns:
+            # Linha curta: relida pelo módulo csv e completada com nulos, como na engine Python
+            values = next(csv.reader([row.text], escapechar=escapechar), [])
+            recovered_rows.append(values + [np.nan] * (row.expected_columns - len(values)))
+            report['recovered'] += 1
+        else:
+            reason = f"{row.actual_columns} campos (esperados {row.expected_columns})"
+            report['skipped'] += 1
+            report['reasons'][reason] = report['reasons'].get(reason, 0) + 1
+        return 'skip'
+    
+    with _open_csv_source(source) as stream:
+        table = pa_csv.read_csv(
+            stream,
+            read_options=pa_csv.ReadOptions(encoding=encoding),
+            parse_options=pa_csv.ParseOptions(
+                escape_char=escapechar or False,
+                newlines_in_values=True,
+                invalid_row_handler=handle_invalid_row
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in header},
+                strings_can_be_null=True
+            )
+        )
+    
+    df = table.to_pandas()
+    if recovered_rows:
+        # Linhas recuperadas são acrescentadas ao final da tabela
+        recovered = pd.DataFrame(recovered_rows, columns=df.columns).replace('', np.nan)
+        df = pd.concat([df, recovered], ignore_index=True)
+    
+    # Mesma nomenclatura do pandas para colunas sem nome
+    return df.rename(columns={name: f"Unnamed: {i}" for i, name in enumerate(df.columns) if name == ''})
+
+def _read_csv_c(source, encoding, escapechar, report):
+    """Leitura pela engine C do pandas, apenas para arquivos sem linhas inválidas
+    
+    A engine C só informa as linhas ignoradas por avisos (warnings), capturados de forma
+    global e não segura entre threads; com linhas inválidas, a leitura falha e segue para
+    a engine Python, que as contabiliza por chamada.
+    """
+    with _open_csv_source(source) as stream:
+        return pd.read_csv(
+            stream,
+            encoding=encoding,
+            escapechar=escapechar,
+            on_bad_lines='error',
+            engine='c',
+            dtype=str
+        )
+
+def _read_csv_python(source, encoding, escapechar, report):
+    """Último recurso: engine Python do pandas, mais tolerante e mais lenta"""
+    with _open_csv_source(source) as stream:
+        expected_columns = len(_read_csv_header(stream, encoding, escapechar))
+    
+    def handle_bad_line(bad_line):
+        reason = f"{len(bad_line)} campos (esperados {expected_columns})"
+        report['skipped'] += 1
+        report['reasons'][reason] = report['reasons'].get(reason, 0) + 1
+        return None
+    
+    with _open_csv_source(source) as stream:
+        return pd.read_csv(
+            stream,
+            encoding=encoding,
+            quotechar='"',
+            escapechar=escapechar,
+            on_bad_lines=handle_bad_line,
+            engine='python',
+            dtype=str
+        )
+
+# Escada de engines de leitura, da mais rápida para a mais tolerante
+CSV_ENGINES = [
+    ('pyarrow', _read_csv_pyarrow),
+    ('c', _read_csv_c),
+    ('python', _read_csv_python),
+]
+
+def read_csv_fast(source, encoding='utf-8', escapechar=None):
+    """Lê o CSV tentando as engines em ordem; retorna (df, relatório da leitura)
+    
+    O relatório informa a engine usada, as linhas ignoradas por motivo e as linhas
+    curtas recuperadas. Erros de encoding são repassados para quem chamou.
+    """
+    errors = []
+    for engine, reader in CSV_ENGINES:
+        report = {'engine': engine, 'skipped': 0, 'recovered': 0, 'reasons': {}, 'fallbacks': errors}
+        try:
+            return reader(source, encoding, escapechar, report), report
+        except UnicodeDecodeError:
+            raise
+        except Exception as e:
+            if engine == CSV_ENGINES[-1][0]:
+                raise
+            errors.append(f"{engine}: {str(e)}")
+
+# Texto padrão para observações em branco
+DEFAULT_OBSERVACAO = 'Classificação baseada em Termos Chave'
+
+# Renomeação de colunas específicas
+COLUMN_RENAMES = {
+    'classificacao_final - Copiar': 'Predição CIC',
+    'predicao classificacao': 'Predição STI'
+}
+
+def stage_drop_empty_rows(df):
+    """Remove linhas completamente vazias e colunas com nomes inválidos"""
+    df = df.dropna(how='all')
+    return df.loc[:, ~df.columns.astype(str).str.contains('^Unnamed')]
+
+def stage_drop_empty_columns(df):
+    """Remove colunas completamente vazias"""
+    return df.dropna(axis=1, how='all')
+
+def stage_convert_types(df):
+    """Conversões de tipos mais seguras (datas, ano, valores e pontuações)"""
+    df = df.copy()
+    
+    if 'data realizacao licitacao' in df.columns:
+        df['data realizacao licitacao'] = pd.to_datetime(df['data realizacao licitacao'], errors='coerce')
+    
+    if 'ano' in df.columns:
+        df['ano'] = pd.to_numeric(df['ano'], errors='coerce')
+    
+    if 'valor estimado' in df.columns and not pd.api.types.is_numeric_dtype(df['valor estimado']):
+        # Remove caracteres não numéricos exceto pontos e vírgulas
+        valores = df['valor estimado'].astype(str).str.replace(r'[^\d.,]', '', regex=True)
+        df['valor estimado'] = pd.to_numeric(valores.str.replace(',', '.', regex=False), errors='coerce')
+    
+    for col in ['pontuacao', 'pontuacao_final']:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    
+    return df
+
+def stage_fill_observacoes(df):
+    """Preenche observações em branco com o texto padrão"""
+    if 'observacoes' in df.columns:
+        blank = df['observacoes'].isna() | df['observacoes'].astype(str).str.strip().eq('')
+        df = df.assign(observacoes=df['observacoes'].mask(blank, DEFAULT_OBSERVACAO))
+    return df
+
+def stage_rename_columns(df):
+    """Aplica os novos nomes das colunas de predição"""
+    return df.rename(columns={old: new for old, new in COLUMN_RENAMES.items() if old in df.columns})
+
+def category_pairs(row_hashes, classifications):
+    """Pares distintos (hash da linha, hash da classificação), ignorando classificações vazias"""
+    pairs = pd.DataFrame({
+        'linha': row_hashes,
+        'classificacao': pd.util.hash_pandas_object(classifications, index=False).values
+    })[classifications.notna().values]
+    return pairs.drop_duplicates()
+
+def stage_drop_duplicates(df, row_hashes=None):
+    """Remove duplicatas ignorando a coluna 'classificacao_final'
+    
+    Antes da remoção, conta em quantas classificações cada edital aparece
+    (coluna 'quantidade_categorias'). Com 'row_hashes' (hash de cada linha sem a
+    classificação, já calculado), as linhas são comparadas pelos hashes.
+    """
+    columns_for_dedup = [col for col in df.columns if col != 'classificacao_final']
+    if columns_for_dedup:
+        if row_hashes is None:
+            keep = ~df.duplicated(subset=columns_for_dedup, keep='first').to_numpy()
+            if 'classificacao_final' in df.columns:
+                row_hashes = pd.util.hash_pandas_object(df[columns_for_dedup], index=False).values
+        else:
+            keep = ~pd.Series(row_hashes).duplicated().to_numpy()
+        if 'classificacao_final' in df.columns:
+            category_counts = category_pairs(row_hashes, df['classificacao_final']).groupby('linha').size()
+        df = df[keep]
+        if 'classificacao_final' in df.columns:
+            df = df.assign(quantidade_categorias=category_counts.reindex(row_hashes[keep], fill_value=0).values)
+    return df
+
+# Colunas de baixa cardinalidade armazenadas como category
+CATEGORICAL_COLUMNS = ['unidade', 'ente', 'modalidade', 'observacoes', 'descricao situacao edital']
+# Colunas de classificação, que compartilham o mesmo vocabulário de categorias
+CLASSIFICATION_COLUMNS = ['classificacao_final', 'Predição CIC', 'Predição STI']
+
+def stage_categorize(df):
+    """Converte colunas de baixa cardinalidade para category (códigos inteiros + vocabulário)"""
+    df = df.copy()
+    
+    # Vocabulário único para as classificações, permitindo comparar CIC x STI pelos códigos
+    classification_columns = [col for col in CLASSIFICATION_COLUMNS if col in df.columns]
+    if classification_columns:
+        vocabulary = set()
+        for col in classification_columns:
+            vocabulary.update(df[col].dropna().astype(str).unique())
+        shared_dtype = pd.CategoricalDtype(sorted(vocabulary))
+        for col in classification_columns:
+            df[col] = df[col].astype(shared_dtype)
+    
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            if df[col].nunique() <= len(df) // 2:
+                df[col] = df[col].astype('category')
+    
+    return df
+
+# Estágios do tratamento dos dados, executados em ordem uma única vez por versão dos dados
+NORMALIZATION_STAGES = [
+    ('Limpeza de linhas vazias', stage_drop_empty_rows),
+    ('Limpeza de colunas vazias', stage_drop_empty_columns),
+    ('Conversão de tipos', stage_convert_types),
+    ('Preenchimento de observações', stage_fill_observacoes),
+    ('Renomeação de colunas', stage_rename_columns),
+    ('Remoção de duplicatas', stage_drop_duplicates),
+    ('Conversão para categorias', stage_categorize),
+]
+
+# Estágios que dependem da base inteira - na leitura em blocos são tratados à parte
+DATASET_WIDE_STAGES = [stage_drop_empty_columns, stage_drop_duplicates, stage_categorize]
+# Estágios aplicados linha a linha (leitura em blocos e tratamento incremental)
+ROW_STAGES = [(name, stage) for name, stage in NORMALIZATION_STAGES if stage not in DATASET_WIDE_STAGES]
+
+def numeric_columns_as_float(df):
+    """Colunas numéricas sempre em float64, para que os hashes das linhas não dependam do subconjunto
+    (um bloco sem nulos em 'ano' produziria int64)"""
+    numeric_columns = [
+        col for col in df.columns
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_datetime64_any_dtype(df[col])
+    ]
+    return df.astype({col: 'float64' for col in numeric_columns})
+
+def normalize_dataset(df, timings=None):
+    """Executa os estágios de tratamento e registra o tempo de cada um em df.attrs"""
+    timings = list(timings or [])
+    
+    for stage_name, stage in NORMALIZATION_STAGES:
+        start = time.perf_counter()
+        df = stage(df)
+        timings.append((stage_name, time.perf_counter() - start))
+    
+    start = time.perf_counter()
+    df.attrs['dataset_version'] = compute_dataset_version(df)
+    timings.append(('Versionamento', time.perf_counter() - start))
+    
+    df.attrs['load_timings'] = timings
+    return df
+
+def raw_row_hashes(raw):
+    """Hash de cada linha do CSV original: colunas unidas em um único texto (Arrow) e hasheadas de uma vez"""
+    columns = [pa.array(raw[col], from_pandas=True).cast(pa.string()) for col in raw.columns]
+    joined = pc.binary_join_element_wise(*columns, '\x1e', null_handling='replace', null_replacement='\x00')
+    return pd.util.hash_array(joined.to_numpy(zero_copy_only=False).astype(object), categorize=False)
+
+def rows_from_published(state, indices, index):
+    """Linhas tratadas da versão anterior (antes dos estágios da base inteira), refeitas a partir da base publicada
+    
+    Cada linha é a linha publicada com o mesmo hash de deduplicação, com a sua própria
+    'classificacao_final'; colunas removidas por estarem vazias voltam como nulas.
+    """
+    rows = state['df'].iloc[state['positions'][indices]].reindex(columns=state['row_columns'])
+    if state['classifications'] is not None:
+        rows = rows.assign(classificacao_final=state['classifications'][indices])
+    return rows.astype(state['row_dtypes']).set_axis(index)
+
+def normalize_dataset_incremental(raw, state=None, timings=None):
+    """Tratamento incremental: apenas as linhas novas ou alteradas passam pelos estágios por linha
+    
+    As linhas são identificadas pelo hash do conteúdo original; as já tratadas na versão
+    anterior ('state') são refeitas a partir da base publicada ('state["df"]'), assim como seus
+    hashes de deduplicação. Sem estado compatível, todas as linhas são tratadas. Retorna
+    (df, novo estado, posição de cada linha final na versão anterior ou -1).
+    """
+    timings = list(timings or [])
+    if state is not None and state['columns'] != list(raw.columns):
+        state = None
+    
+    start = time.perf_counter()
+    raw_hashes = raw_row_hashes(raw)
+    reuse = state['raw_index'].get_indexer(raw_hashes) if state is not None else np.full(len(raw), -1)
+    changed = reuse < 0
+    timings.append((f"Detecção de alterações ({format_number_br(int(changed.sum()))} linhas novas ou alteradas)", time.perf_counter() - start))
+    
+    # Estágios por linha apenas nas linhas novas ou alteradas
+    start = time.perf_counter()
+    new_rows = raw[changed]
+    for _, stage in ROW_STAGES:
+        new_rows = stage(new_rows)
+    new_rows = numeric_columns_as_float(new_rows)
+    if state is not None:
+        try:
+            new_rows = new_rows[state['row_columns']].astype(state['row_dtypes'])
+        except (KeyError, ValueError, TypeError):
+            # Estrutura incompatível com a versão anterior: tratamento completo
+            return normalize_dataset_incremental(raw, None, timings)
+    dedup_columns = [col for col in new_rows.columns if col != 'classificacao_final']
+    new_hashes = pd.util.hash_pandas_object(new_rows[dedup_columns], index=False).values
+    
+    # Linhas reaproveitadas + linhas tratadas agora, na ordem do arquivo
+    if state is not None:
+        kept = np.flatnonzero(~changed)
+        reused_rows = rows_from_published(state, reuse[kept], raw.index[kept])
+        rows = pd.concat([reused_rows, new_rows])
+        row_hashes = np.concatenate([state['row_hashes'][reuse[kept]], new_hashes])
+        order = np.argsort(rows.index.to_numpy(), kind='stable')
+        rows, row_hashes = rows.iloc[order], row_hashes[order]
+    else:
+        rows, row_hashes = new_rows, new_hashes
+    timings.append(('Tratamento das linhas alteradas', time.perf_counter() - start))
+    
+    # Estágios da base inteira, a partir dos hashes já calculados
+    start = time.perf_counter()
+    non_empty_columns = {COLUMN_RENAMES.get(col, col) for col in raw.columns[raw.notna().any().to_numpy()]}
+    df = rows[[col for col in rows.columns if col in non_empty_columns]]
+    df = stage_drop_duplicates(df, row_hashes)
+    final_hashes = row_hashes[rows.index.get_indexer(df.index)]
+    df = stage_categorize(df)
+    timings.append(('Remoção de duplicatas e categorias', time.perf_counter() - start))
+    
+    start = time.perf_counter()
+    classification_columns = [col for col in ['classificacao_final', 'quantidade_categorias'] if col in df.columns]
+    version_hashes = final_hashes
+    if classification_columns:
+        version_hashes = final_hashes ^ pd.util.hash_pandas_object(df[classification_columns], index=False).values
+    df.attrs['dataset_version'] = compute_dataset_version(df, version_hashes)
+    df.attrs['load_timings'] = timings + [('Versionamento', time.perf_counter() - start)]
+    
+    previous_positions = None
+    if state is not None:
+        previous_positions = pd.Index(state['final_hashes']).get_indexer(final_hashes)
+    
+    # Estado da nova versão: só hashes e posições na base publicada (sem uma segunda cópia das linhas);
+    # a classificação é a única coluna que pode diferir da linha publicada com o mesmo hash
+    rows_raw_hashes = raw_hashes[raw.index.get_indexer(rows.index)]
+    unique_rows = ~pd.Series(rows_raw_hashes).duplicated().to_numpy()
+    classifications = None
+    if 'classificacao_final' in rows.columns:
+        classifications = pd.Categorical(rows['classificacao_final'][unique_rows])
+    new_state = {
+        'version': df.attrs['dataset_version'],
+        'columns': list(raw.columns),
+        'row_columns': list(rows.columns),
+        'row_dtypes': rows.dtypes.to_dict(),
+        'raw_index': pd.Index(rows_raw_hashes[unique_rows]),
+        'row_hashes': row_hashes[unique_rows],
+        'positions': pd.Index(final_hashes).get_indexer(row_hashes[unique_rows]).astype(np.int32),
+        'classifications': classifications,
+        'final_hashes': final_hashes,
+        'df': df
+    }
+    return df, new_state, previous_positions
+
+def load_data_from_sharepoint(delta_state=None, published_key=None):
+    """Carrega dados diretamente do SharePoint (executado pela thread de atualização)
+    
+    Retorna (df, erro, delta). Com o estado incremental da versão anterior ('delta_state'),
+    apenas as linhas novas ou alteradas são tratadas; 'delta' traz o novo estado e a
+    correspondência das linhas com a versão anterior (None quando a base vem do snapshot).
+    Se o conteúdo ainda é o do snapshot 'published_key' (já publicado), retorna
+    (None, None, None) sem ler a base novamente. A chave do snapshot fica em df.attrs.
+    """
+    csv_path = None
     try:
+        start = time.perf_counter()
+        
         # Primeira tentativa - URL com download=1
+        source_url = SHAREPOINT_CSV_URL
         try:
-            response = requests.get(SHAREPOINT_CSV_URL, timeout=30)
-            response.raise_for_status()
+            snapshot_key, csv_path = fetch_remote_csv(source_url)
         except:
             # Segunda tentativa - URL original
-            response = requests.get(SHAREPOINT_URL, timeout=30)
-            response.raise_for_status()
+            source_url = SHAREPOINT_URL
+            snapshot_key, csv_path = fetch_remote_csv(source_url)
+        
+        # Conteúdo igual ao da versão publicada (304 ou mesmo hash): nada a recarregar
+        if published_key is not None and snapshot_key == published_key:
+            return None, None, None
+        
+        # Se o conteúdo não mudou (304 ou mesmo hash), reaproveita a base já tratada do snapshot
+        timings = [('Download', time.perf_counter() - start)]
+        start = time.perf_counter()
+        df = load_snapshot(snapshot_key)
+        if df is not None:
+            timings.append(('Leitura do snapshot', time.perf_counter() - start))
+            df.attrs['load_timings'] = timings
+            df.attrs['snapshot_key'] = snapshot_key
+            return df, None, None
+        if csv_path is None:
+            # Snapshot removido após a revalidação - baixa novamente sem cabeçalhos condicionais
+            snapshot_key, csv_path = fetch_remote_csv(source_url, revalidate=False)
         
         # Primeiro, tenta o método padrão mais robusto
         try:
-            df = pd.read_csv(
-                io.StringIO(response.text),
-                encoding='utf-8',
-                sep=',',
-                quotechar='"',
-                escapechar='\\',
-                on_bad_lines='skip',  # Pula linhas problemáticas
-                engine='python',  # Engine mais tolerante
-                dtype=str,  # Carrega tudo como string primeiro
-                low_memory=False
-            )
+            # Escada de engines (pyarrow -> C -> Python), tudo como texto
+            df, ingestion_report = read_csv_fast(csv_path, encoding='utf-8', escapechar='\\')
         except Exception as e1:
             # Método alternativo - tenta com delimitador automático
             try:
                 df = pd.read_csv(
-                    io.StringIO(response.text),
+                    csv_path,
                     sep=None,  # Detecta automaticamente o delimitador
                     engine='python',
                     encoding='utf-8',
                     on_bad_lines='skip',
                     dtype=str
                 )
+                ingestion_report = {'engine': 'python (delimitador automático)', 'skipped': 0, 'recovered': 0, 'reasons': {}}
             except Exception as e2:
                 # Último recurso - verifica se é HTML (página de login)
-                if "<html" in response.text.lower() or "sign in" in response.text.lower():
-                    return None, "SharePoint requer autenticação - use upload manual ou configure permissões públicas"
+                with open(csv_path, encoding='utf-8', errors='ignore') as csv_file:
+                    content_head = csv_file.read(DOWNLOAD_CHUNK_SIZE).lower()
+                if "<html" in content_head or "sign in" in content_head:
+                    return None, "SharePoint requer autenticação - use upload manual ou configure permissões públicas", None
                 
-                return None, f"Erro de parsing: {str(e1)}. Tentativa alternativa: {str(e2)}"
-        
-        # Remove linhas completamente vazias
-        df = df.dropna(how='all')
-        
-        # Remove colunas que são completamente vazias ou têm nomes inválidos
-        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-        df = df.dropna(axis=1, how='all')
-        
-        # Conversões de tipos mais seguras
-        if 'data realizacao licitacao' in df.columns:
-            df['data realizacao licitacao'] = pd.to_datetime(df['data realizacao licitacao'], errors='coerce')
-        
-        if 'ano' in df.columns:
-            df['ano'] = pd.to_numeric(df['ano'], errors='coerce')
-        
-        if 'valor estimado' in df.columns:
-            # Remove caracteres não numéricos exceto pontos e vírgulas
-            df['valor estimado'] = df['valor estimado'].astype(str).str.replace(r'[^\d.,]', '', regex=True)
-            df['valor estimado'] = df['valor estimado'].str.replace(',', '.', regex=False)
-            df['valor estimado'] = pd.to_numeric(df['valor estimado'], errors='coerce')
-        
-        if 'pontuacao' in df.columns:
-            df['pontuacao'] = df['pontuacao'].astype(str).str.replace(',', '.', regex=False)
-            df['pontuacao'] = pd.to_numeric(df['pontuacao'], errors='coerce')
-            
-        if 'pontuacao_final' in df.columns:
-            df['pontuacao_final'] = df['pontuacao_final'].astype(str).str.replace(',', '.', regex=False)
-            df['pontuacao_final'] = pd.to_numeric(df['pontuacao_final'], errors='coerce')
-        
-        # Processamento da coluna observacoes - preenche valores em branco
-        if 'observacoes' in df.columns:
-            df['observacoes'] = df['observacoes'].apply(
-                lambda x: x if pd.notna(x) and str(x).strip() != '' else 'Classificação baseada em Termos Chave'
-            )
-        
-        # Renomeação de colunas específicas
-        column_renames = {
-            'classificacao_final - Copiar': 'Predição CIC',
-            'predicao classificacao': 'Predição STI'
-        }
+                return None, f"Erro de parsing: {str(e1)}. Tentativa alternativa: {str(e2)}", None
         
-        for old_name, new_name in column_renames.items():
-            if old_name in df.columns:
-                df = df.rename(columns={old_name: new_name})
+        timings.append(('Leitura do CSV', time.perf_counter() - start))
         
-        # Remoção de duplicatas ignorando a coluna 'classificacao_final'
-        columns_for_dedup = [col for col in df.columns if col != 'classificacao_final']
-        if columns_for_dedup:
-            df = df.drop_duplicates(subset=columns_for_dedup, keep='first')
-        
-        # Processamento da coluna observacoes - preenche valores em branco
-        if 'observacoes' in df.columns:
-            df['observacoes'] = df['observacoes'].apply(
-                lambda x: x if pd.notna(x) and str(x).strip() != '' else 'Classificação baseada em Termos Chave'
-            )
+        # Tratamento dos dados (tipos, observações, nomes e duplicatas), só das linhas alteradas
+        previous_version = delta_state['version'] if delta_state is not None else None
+        df, new_state, previous_positions = normalize_dataset_incremental(df, delta_state, timings)
+        df.attrs['ingestion_report'] = ingestion_report
+        delta = {'state': new_state, 'previous_version': previous_version, 'previous_positions': previous_positions}
         
         # Validação final - se o dataframe está vazio ou muito pequeno
         if len(df) == 0:
-            return None, "Nenhum dado válido encontrado na planilha"
+            return None, "Nenhum dado válido encontrado na planilha", None
         
         if len(df.columns) < 5:
-            return None, "Estrutura de dados incompleta - muito poucas colunas"
+            return None, "Estrutura de dados incompleta - muito poucas colunas", None
+        
+        save_snapshot(df, snapshot_key)
+        df.attrs['snapshot_key'] = snapshot_key
             
-        return df, None
+        return df, None, delta
         
     except requests.exceptions.RequestException as e:
         if "403" in str(e) or "401" in str(e):
-            return None, "Acesso negado - SharePoint requer permissões ou autenticação"
-        return None, f"Erro de conexão: {str(e)}"
+            return None, "Acesso negado - SharePoint requer permissões ou autenticação", None
+        return None, f"Erro de conexão: {str(e)}", None
     except pd.errors.EmptyDataError:
-        return None, "Planilha está vazia ou não contém dados válidos"
+        return None, "Planilha está vazia ou não contém dados válidos", None
     except pd.errors.ParserError as e:
-        return None, f"Erro de formatação dos dados: {str(e)}"
+        return None, f"Erro de formatação dos dados: {str(e)}", None
+    except Exception as e:
+        return None, f"Erro inesperado: {str(e)}", None
+    finally:
+        # Remove o CSV temporário do download
+        if csv_path is not None and os.path.exists(csv_path):
+            os.remove(csv_path)
+
+# Intervalo entre atualizações automáticas da base do SharePoint (segundos)
+SHAREPOINT_REFRESH_INTERVAL = 300
+
+def refresh_sharepoint_source(source):
+    """Baixa e trata a base do SharePoint, constrói os índices e troca a versão publicada
+    
+    A versão anterior continua sendo servida até a nova estar pronta; em caso de erro,
+    ela é mantida e o erro fica registrado em 'last_error'. Alterações na planilha são
+    aplicadas de forma incremental (normalize_dataset_incremental e update_search_index).
+    """
+    source['refreshing'] = True
+    try:
+        previous_store = source['result'][2] if source['result'] is not None else None
+        published_key = source['snapshot_key'] if previous_store is not None else None
+        df, error, delta = load_data_from_sharepoint(source['delta_state'], published_key)
+        if df is None and error is None:
+            # Conteúdo inalterado: a base publicada continua valendo, sem nova leitura
+            with source['lock']:
+                source['updated_at'] = datetime.now()
+                source['last_error'] = None
+        elif df is not None:
+            dataset_version = df.attrs.get('dataset_version') or compute_dataset_version(df)
+            if previous_store is not None and previous_store['version'] == dataset_version:
+                # Mesma versão: mantém a base publicada em vez de uma segunda cópia dela
+                with source['lock']:
+                    source['snapshot_key'] = df.attrs.get('snapshot_key')
+                    source['updated_at'] = datetime.now()
+                    source['last_error'] = None
+                if delta is not None:
+                    # Mesmo conteúdo, na mesma ordem: as posições do estado valem para a base publicada
+                    source['delta_state'] = dict(delta['state'], df=previous_store['df'])
+                return
+            
+            # Índice de busca atualizado a partir da versão publicada, quando ela é a base do delta
+            search_index = None
+            if (
+                delta is not None
+                and previous_store is not None
+                and previous_store['search_index'] is not None
+                and delta['previous_positions'] is not None
+                and previous_store['version'] == delta['previous_version']
+            ):
+                search_index = update_search_index(
+                    previous_store['search_index'], delta['previous_positions'], df, dataset_version
+                )
+            
+            # Índices e agregados construídos fora do caminho das requisições
+            store = get_dataset_store(df, dataset_version, search_index)
+            with source['lock']:
+                source['result'] = (store['df'], None, store)
+                source['snapshot_key'] = df.attrs.get('snapshot_key')
+                source['updated_at'] = datetime.now()
+                source['last_error'] = None
+            
+            # O estado incremental só avança depois que a nova versão foi publicada
+            if delta is not None:
+                source['delta_state'] = dict(delta['state'], df=store['df'])
+            else:
+                source['delta_state'] = None
+        else:
+            publish_sharepoint_error(source, error)
+    except Exception as e:
+        # Falhas fora da leitura (índices, agregados, memória) também chegam às sessões
+        publish_sharepoint_error(source, f"Erro inesperado: {str(e)}")
+    finally:
+        source['refreshing'] = False
+        source['ready'].set()
+
+def publish_sharepoint_error(source, error):
+    """Registra o erro da atualização, mantendo a versão publicada (se houver)"""
+    with source['lock']:
+        if source['result'] is None or source['result'][0] is None:
+            source['result'] = (None, error, None)
+        source['last_error'] = error
+
+def _sharepoint_refresh_loop(source):
+    """Laço da thread de atualização: atualiza a cada intervalo ou quando solicitado, até ser encerrado"""
+    while not source['stop'].is_set():
+        try:
+            refresh_sharepoint_source(source)
+        except Exception as e:
+            source['last_error'] = f"Erro inesperado: {str(e)}"
+        source['wake'].wait(SHAREPOINT_REFRESH_INTERVAL)
+        source['wake'].clear()
+
+def stop_sharepoint_source(source):
+    """Encerra a thread de atualização quando o recurso sai do cache (limpeza ou remoção)"""
+    source['stop'].set()
+    source['wake'].set()
+
+@st.cache_resource(show_spinner=False, on_release=stop_sharepoint_source)
+def get_sharepoint_source():
+    """Estado da base do SharePoint compartilhado pelo processo, mantido por uma thread em segundo plano
+    
+    'result' guarda (df, erro, store) da versão publicada, trocado de uma só vez. Ao sair do
+    cache, a thread é encerrada, de modo que há sempre uma única atualização em andamento.
+    """
+    source = {
+        'lock': threading.Lock(),
+        'ready': threading.Event(),
+        'wake': threading.Event(),
+        'stop': threading.Event(),
+        'result': None,
+        'delta_state': None,
+        'snapshot_key': None,
+        'updated_at': None,
+        'last_error': None,
+        'refreshing': False
+    }
+    thread = threading.Thread(target=_sharepoint_refresh_loop, args=(source,), name='sharepoint-refresh', daemon=True)
+    thread.start()
+    return source
+
+def request_sharepoint_refresh():
+    """Antecipa a próxima atualização da base do SharePoint, sem bloquear a sessão"""
+    get_sharepoint_source()['wake'].set()
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_data_from_upload(file_content, file_name):
+    """Lê e trata o CSV enviado uma única vez por arquivo; retorna (df, erro, encoding)"""
+    start = time.perf_counter()
+    try:
+        # Primeira tentativa - encoding UTF-8
+        encoding = 'utf-8'
+        df, ingestion_report = read_csv_fast(file_content, encoding=encoding)
+    except UnicodeDecodeError:
+        try:
+            # Segunda tentativa - encoding latin-1
+            encoding = 'latin-1'
+            df, ingestion_report = read_csv_fast(file_content, encoding=encoding)
+        except Exception as e2:
+            return None, f"Erro de encoding: {str(e2)}", None
     except Exception as e:
-        return None, f"Erro inesperado: {str(e)}"
+        return None, f"Erro ao processar arquivo: {str(e)}", None
+    
+    # Tratamento único dos dados, o mesmo aplicado à base do SharePoint
+    df = normalize_dataset(df, [('Leitura do CSV', time.perf_counter() - start)])
+    df.attrs['ingestion_report'] = ingestion_report
+    return df, None, encoding
+
+# Uploads acima deste tamanho são lidos em blocos (50 MB)
+STREAMING_UPLOAD_THRESHOLD = 50 * 1024 * 1024
+# Tamanho de cada bloco lido na leitura em streaming (16 MB)
+STREAMING_BLOCK_SIZE = 16 * 1024 * 1024
+
+def _arrow_schema_for(chunk):
+    """Esquema colunar fixo, derivado do primeiro bloco já tratado"""
+    fields = [pa.field('__linha__', pa.int64())]
+    for col in chunk.columns:
+        if pd.api.types.is_datetime64_any_dtype(chunk[col]):
+            fields.append(pa.field(col, pa.timestamp('ns')))
+        elif pd.api.types.is_numeric_dtype(chunk[col]):
+            fields.append(pa.field(col, pa.float64()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
 
-def create_overview_metrics(df):
-    """Cria métricas de visão geral com dados fixos da base completa"""
+def stream_csv_to_store(stream, encoding, store_path):
+    """Lê o CSV em blocos, tratando e deduplicando cada bloco, e grava o resultado em um arquivo colunar
+    
+    A deduplicação entre blocos usa o hash das linhas, de modo que a memória de pico depende
+    do tamanho do bloco e não do tamanho do arquivo. Retorna (colunas não vazias, relatório, tempos,
+    quantidade de categorias de cada linha gravada ou None).
+    """
+    report = {'engine': 'pyarrow (blocos)', 'skipped': 0, 'recovered': 0, 'reasons': {}}
+    timings = {}
+    recovered_rows = []
+    
+    def handle_invalid_row(row):
+        if row.actual_columns < row.expected_columns:
+            values = next(csv.reader([row.text]), [])
+            recovered_rows.append(values + [np.nan] * (row.expected_columns - len(values)))
+            report['recovered'] += 1
+        else:
+            reason = f"{row.actual_columns} campos (esperados {row.expected_columns})"
+            report['skipped'] += 1
+            report['reasons'][reason] = report['reasons'].get(reason, 0) + 1
+        return 'skip'
+    
+    header = _read_csv_header(stream, encoding)
+    stream.seek(0)
+    reader = pa_csv.open_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(encoding=encoding, block_size=STREAMING_BLOCK_SIZE),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True, invalid_row_handler=handle_invalid_row),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in header},
+            strings_can_be_null=True
+        )
+    )
+    
+    seen_hashes = np.empty(0, dtype=np.uint64)
+    # Hashes das linhas gravadas (na ordem do arquivo) e pares linha/classificação de todos os blocos
+    written_hashes = []
+    pairs = []
+    non_empty_columns = set()
+    row_offset = 0
+    writer = None
+    
+    try:
+        for batch in reader:
+            chunk = batch.to_pandas()
+            chunk = chunk.rename(columns={name: f"Unnamed: {i}" for i, name in enumerate(chunk.columns) if name == ''})
+            if recovered_rows:
+                recovered = pd.DataFrame(recovered_rows, columns=chunk.columns).replace('', np.nan)
+                chunk = pd.concat([chunk, recovered], ignore_index=True)
+                recovered_rows.clear()
+            chunk.index = pd.RangeIndex(row_offset, row_offset + len(chunk))
+            row_offset += len(chunk)
+            
+            # Colunas com algum valor no arquivo original (com os nomes já renomeados)
+            non_empty_columns.update(COLUMN_RENAMES.get(col, col) for col in chunk.columns[chunk.notna().any()])
+            
+            for stage_name, stage in ROW_STAGES:
+                start = time.perf_counter()
+                chunk = stage(chunk)
+                timings[stage_name] = timings.get(stage_name, 0) + time.perf_counter() - start
+            
+            chunk = numeric_columns_as_float(chunk)
+            
+            # Deduplicação dentro do bloco e contra os blocos anteriores
+            start = time.perf_counter()
+            columns_for_dedup = [col for col in chunk.columns if col != 'classificacao_final']
+            row_hashes = pd.util.hash_pandas_object(chunk[columns_for_dedup], index=False).values
+            keep = ~pd.Series(row_hashes).duplicated().values & ~np.isin(row_hashes, seen_hashes)
+            seen_hashes = np.union1d(seen_hashes, row_hashes[keep])
+            if 'classificacao_final' in chunk.columns:
+                pairs.append(category_pairs(row_hashes, chunk['classificacao_final']))
+            written_hashes.append(row_hashes[keep])
+            chunk = chunk[keep]
+            timings['Remoção de duplicatas'] = timings.get('Remoção de duplicatas', 0) + time.perf_counter() - start
+            
+            if writer is None:
+                schema = _arrow_schema_for(chunk)
+                writer = pa.ipc.new_file(store_path, schema)
+            chunk = chunk.reset_index(names='__linha__')
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    category_counts = None
+    if pairs:
+        counts = pd.concat(pairs).drop_duplicates().groupby('linha').size()
+        category_counts = counts.reindex(np.concatenate(written_hashes), fill_value=0).values
+    
+    return non_empty_columns, report, list(timings.items()), category_counts
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_large_upload(_uploaded_file, file_id):
+    """Leitura em streaming de uploads grandes; retorna (df, erro, encoding) como load_data_from_upload"""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    # Arquivo colunar no mesmo diretório (e com a mesma retenção) dos snapshots
+    store_path = snapshot_path(f"upload_{hashlib.sha1(str(file_id).encode('utf-8')).hexdigest()[:16]}")
+    start = time.perf_counter()
+    
+    for encoding in ['utf-8', 'latin-1']:
+        _uploaded_file.seek(0)
+        try:
+            non_empty_columns, ingestion_report, timings, category_counts = stream_csv_to_store(
+                _uploaded_file, encoding, store_path
+            )
+            break
+        except (UnicodeDecodeError, pa.ArrowInvalid) as e:
+            # Conteúdo fora do UTF-8: repete a leitura com latin-1
+            if encoding == 'utf-8' and ('utf' in str(e).lower() or isinstance(e, UnicodeDecodeError)):
+                continue
+            return None, f"Erro ao processar arquivo: {str(e)}", None
+        except Exception as e:
+            return None, f"Erro ao processar arquivo: {str(e)}", None
+    
+    if not os.path.exists(store_path):
+        return None, "Nenhum dado válido encontrado no arquivo", None
+    prune_snapshots()
+    
+    # Base final lida do arquivo colunar mapeado em memória
+    df = feather.read_table(store_path, memory_map=True).to_pandas()
+    df = df.set_index('__linha__').rename_axis(None)
+    df = df[[col for col in df.columns if col in non_empty_columns]]
+    if category_counts is not None and 'classificacao_final' in df.columns:
+        df['quantidade_categorias'] = category_counts
+    
+    start_categorize = time.perf_counter()
+    df = stage_categorize(df)
+    timings.append(('Conversão para categorias', time.perf_counter() - start_categorize))
+    
+    timings = timings + [('Leitura em blocos (total)', time.perf_counter() - start)]
+    df.attrs['dataset_version'] = compute_dataset_version(df)
+    df.attrs['load_timings'] = timings
+    df.attrs['ingestion_report'] = ingestion_report
+    return df, None, encoding
+
+def create_overview_metrics(statistics):
+    """Cria métricas de visão geral a partir dos indicadores calculados (dataset_statistics)"""
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric(
             label="📋 Total de Editais",
-            value="52.429",
+            value=format_number_br(statistics['total_editais']),
             delta=None
         )
     
     with col2:
         st.metric(
             label="💰 Valor Total Estimado",
-            value="R$ 244 Bilhões",
+            value=format_brl_compact(statistics['valor_total']),
             delta=None
         )
     
     with col3:
         st.metric(
             label="🏷️ Categorias Únicas",
-            value="14",
+            value=format_number_br(statistics['categorias']),
             delta=None
         )
     
     with col4:
         st.metric(
             label="🏢 Unidades Únicas",
-            value="729",
+            value=format_number_br(statistics['unidades']),
             delta=None
         )
 
-def apply_filters(df, search_term, filters):
-    """Aplica os filtros ao dataframe com tratamento melhorado de erros"""
-    filtered_df = df.copy()
+# Colunas consideradas na busca por termo livre
+SEARCH_COLUMNS = ['objeto', 'unidade', 'observacoes', 'todos_termos', 'descricao situacao edital', 'objeto_processada']
+# Separador entre colunas no texto de busca (não aparece nos termos digitados)
+SEARCH_FIELD_SEPARATOR = '\x1f'
+# Padrão de tokenização do índice invertido
+TOKEN_PATTERN = r'\w+'
+# Marcas diacríticas removidas na normalização dos textos de busca
+ACCENT_MARKS_PATTERN = r'[\u0300-\u036f]'
+
+def normalize_search_text(text):
+    """Converte um termo de busca para minúsculas sem acentos ("Saúde" -> "saude")"""
+    decomposed = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def normalize_search_series(series):
+    """Versão vetorizada de normalize_search_text, aplicada apenas aos valores distintos da coluna"""
+    codes, uniques = pd.factorize(series)
+    
+    # Valores nulos (código -1) passam a apontar para o texto vazio
+    uniques = np.append(np.asarray(uniques, dtype=object).astype(str), '')
+    codes = np.where(codes < 0, len(uniques) - 1, codes)
+    folded = pd.Series(uniques, dtype=object).str.lower().str.normalize('NFKD')
+    folded = folded.str.replace(ACCENT_MARKS_PATTERN, '', regex=True)
+    
+    if len(uniques) <= len(series) // 2:
+        # Coluna de baixa cardinalidade: armazenada como categoria
+        folded = pd.Categorical(folded.values[codes])
+        return pd.Series(folded, index=series.index)
+    return pd.Series(folded.values[codes], index=series.index, dtype='string[pyarrow]')
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_search_columns(_df, dataset_version):
+    """Gera as colunas-sombra de busca (minúsculas, sem acentos) uma única vez por versão dos dados"""
+    search_columns = [col for col in SEARCH_COLUMNS if col in _df.columns]
+    return pd.DataFrame(
+        {col: normalize_search_series(_df[col]) for col in search_columns},
+        index=_df.index
+    )
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_search_index(_df, dataset_version):
+    """Constrói o índice invertido (token -> posições das linhas) da busca por termo livre"""
+    shadow_columns = build_search_columns(_df, dataset_version)
+    if len(shadow_columns.columns) == 0:
+        return None
+    
+    text = join_search_text(shadow_columns)
+    pairs = _token_pairs(text)
+    token_ids, vocabulary = pd.factorize(pairs['token'], sort=True)
+    return _inverted_index(dataset_version, text, np.asarray(vocabulary, dtype=object), token_ids, pairs['row'].values)
+
+def join_search_text(shadow_columns):
+    """Texto de busca por linha: colunas-sombra unidas por um separador"""
+    text = shadow_columns.iloc[:, 0].astype(str)
+    for col in shadow_columns.columns[1:]:
+        text = text + SEARCH_FIELD_SEPARATOR + shadow_columns[col].astype(str)
+    return text.reset_index(drop=True).astype('string[pyarrow]')
+
+def _token_pairs(text):
+    """Pares (token, linha) sem repetição do texto de busca"""
+    tokens = text.str.findall(TOKEN_PATTERN).explode().dropna()
+    return pd.DataFrame({'token': tokens.values, 'row': tokens.index.values}).drop_duplicates()
+
+def _inverted_index(dataset_version, text, vocabulary, token_ids, rows):
+    """Monta o índice invertido a partir dos pares (token, linha), agrupados por token"""
+    order = np.argsort(token_ids, kind='stable')
+    counts = np.bincount(token_ids, minlength=len(vocabulary))
+    
+    # Vocabulário em um único texto (um token por linha) para a varredura do autômato de Aho-Corasick
+    token_lengths = np.fromiter((len(token) + 1 for token in vocabulary), dtype=np.int64, count=len(vocabulary))
+    
+    return {
+        'version': dataset_version,
+        'text': text,
+        'vocabulary': pd.Series(vocabulary, dtype=object),
+        'vocabulary_text': '\n'.join(vocabulary),
+        'vocabulary_starts': np.concatenate([[0], np.cumsum(token_lengths)[:-1]]).astype(np.int64),
+        'offsets': np.concatenate([[0], np.cumsum(counts)]),
+        'postings': np.asarray(rows)[order].astype(np.int32)
+    }
+
+def update_search_index(previous_index, previous_positions, df, dataset_version):
+    """Atualiza o índice da versão anterior para uma nova versão dos dados
+    
+    'previous_positions' traz, para cada linha nova, a posição da mesma linha na versão
+    anterior (-1 se nova ou alterada). As listas de posições das linhas inalteradas são
+    remapeadas e apenas as linhas novas são normalizadas e tokenizadas.
+    """
+    reused = previous_positions >= 0
+    new_rows = np.flatnonzero(~reused)
+    search_columns = [col for col in SEARCH_COLUMNS if col in df.columns]
+    subset = df.iloc[new_rows]
+    new_text = join_search_text(pd.DataFrame(
+        {col: normalize_search_series(subset[col]) for col in search_columns}, index=subset.index
+    ))
+    
+    # Texto de busca: linhas inalteradas copiadas da versão anterior
+    text = np.empty(len(df), dtype=object)
+    text[reused] = previous_index['text'].to_numpy(dtype=object)[previous_positions[reused]]
+    text[new_rows] = new_text.to_numpy(dtype=object)
+    text = pd.Series(text, dtype='string[pyarrow]')
+    
+    # Listas de posições anteriores, com as linhas remapeadas (removidas/alteradas descartadas)
+    previous_vocabulary = previous_index['vocabulary'].to_numpy()
+    previous_token_ids = np.repeat(np.arange(len(previous_vocabulary)), np.diff(previous_index['offsets']))
+    old_to_new = np.full(len(previous_index['text']), -1, dtype=np.int64)
+    old_to_new[previous_positions[reused]] = np.flatnonzero(reused)
+    remapped = old_to_new[previous_index['postings']]
+    kept = remapped >= 0
+    
+    # Tokens das linhas novas e vocabulário unificado (ordenado, como em pd.factorize(sort=True))
+    pairs = _token_pairs(new_text)
+    vocabulary = np.union1d(previous_vocabulary, pairs['token'].unique().astype(object))
+    token_ids = np.concatenate([
+        np.searchsorted(vocabulary, previous_vocabulary)[previous_token_ids[kept]],
+        np.searchsorted(vocabulary, pairs['token'].to_numpy(dtype=object))
+    ])
+    rows = np.concatenate([remapped[kept], new_rows[pairs['row'].to_numpy(dtype=np.int64)]])
+    
+    # Tokens sem nenhuma linha restante saem do vocabulário
+    present = np.bincount(token_ids, minlength=len(vocabulary)) > 0
+    token_ids = (np.cumsum(present) - 1)[token_ids]
+    return _inverted_index(dataset_version, text, vocabulary[present], token_ids, rows)
+
+def _fragment_token_ids(search_index, fragments):
+    """Ids dos tokens do vocabulário que contêm cada fragmento
+    
+    Com o pacote pyahocorasick, todos os fragmentos são compilados em um único autômato
+    e o vocabulário é percorrido uma única vez, qualquer que seja a quantidade de termos;
+    sem ele, cada fragmento varre o vocabulário separadamente.
+    """
+    if ahocorasick is None or len(fragments) < 2:
+        vocabulary = search_index['vocabulary']
+        return [np.flatnonzero(vocabulary.str.contains(fragment, regex=False).values) for fragment in fragments]
+    
+    automaton = ahocorasick.Automaton()
+    for fragment_id, fragment in enumerate(fragments):
+        automaton.add_word(fragment, fragment_id)
+    automaton.make_automaton()
+    
+    # Ocorrências (posição final, fragmento) -> token que contém a posição
+    matches = np.array(list(automaton.iter(search_index['vocabulary_text'])), dtype=np.int64).reshape(-1, 2)
+    token_ids = np.searchsorted(search_index['vocabulary_starts'], matches[:, 0], side='right') - 1
+    order = np.lexsort((token_ids, matches[:, 1]))
+    fragment_ids, token_ids = matches[order, 1], token_ids[order]
+    bounds = np.searchsorted(fragment_ids, np.arange(len(fragments) + 1))
+    return [np.unique(token_ids[bounds[i]:bounds[i + 1]]) for i in range(len(fragments))]
+
+def _postings_union(search_index, token_ids):
+    """Une as listas de posições dos tokens informados"""
+    if len(token_ids) == 0:
+        return np.empty(0, dtype=np.int32)
+    offsets = search_index['offsets']
+    postings = search_index['postings']
+    return np.unique(np.concatenate([postings[offsets[i]:offsets[i + 1]] for i in token_ids]))
+
+def match_terms(search_index, search_terms, similarity=None):
+    """Linhas que contêm cada um dos termos, com uma única varredura do vocabulário para todos eles
+    
+    Retorna {'terms', 'term_positions' (linhas de cada termo), 'positions' (união - lógica OR)}.
+    Com 'similarity', a busca é aproximada: cada palavra do termo aceita os tokens parecidos
+    (índice de trigramas) e o termo exige todas as suas palavras, em qualquer ordem.
+    """
+    text = search_index['text']
+    term_fragments = [re.findall(TOKEN_PATTERN, term) for term in search_terms]
+    fragments = sorted({fragment for fragments in term_fragments for fragment in fragments})
+    if similarity:
+        trigram_index = build_trigram_index(search_index, search_index['version'])
+        token_ids = [fuzzy_token_ids(search_index, trigram_index, fragment, similarity) for fragment in fragments]
+    else:
+        token_ids = _fragment_token_ids(search_index, fragments)
+    fragment_positions = {
+        fragment: _postings_union(search_index, fragment_token_ids)
+        for fragment, fragment_token_ids in zip(fragments, token_ids)
+    }
+    
+    term_positions = []
+    for term, fragments in zip(search_terms, term_fragments):
+        if len(fragments) == 1 and fragments[0] == term:
+            # Termo de uma única palavra: união das listas de posições
+            term_positions.append(fragment_positions[term])
+            continue
+        
+        # Termos com espaços ou pontuação: candidatos pela interseção das palavras,
+        # confirmados por busca de substring apenas nessas linhas
+        candidates = None
+        for fragment in fragments:
+            positions = fragment_positions[fragment]
+            candidates = positions if candidates is None else np.intersect1d(candidates, positions, assume_unique=True)
+        if candidates is None:
+            candidates = np.arange(len(text))
+        elif similarity:
+            term_positions.append(candidates.astype(np.int32))
+            continue
+        
+        found = text.iloc[candidates].str.contains(term, regex=False).to_numpy(dtype=bool, na_value=False)
+        term_positions.append(candidates[found].astype(np.int32))
+    
+    positions = np.unique(np.concatenate(term_positions)) if term_positions else np.empty(0, dtype=np.int32)
+    return {'terms': list(search_terms), 'term_positions': term_positions, 'positions': positions}
+
+def search_index_lookup(search_index, search_terms, similarity=None):
+    """Retorna as posições das linhas que contêm qualquer um dos termos (lógica OR)"""
+    terms = tuple(sorted(set(search_terms)))
+    return cached_term_matches(search_index, search_index['version'], terms, similarity)['positions']
+
+def term_hit_counts(term_matches, positions, n_rows):
+    """Quantidade de editais da visão filtrada ('positions') em que cada termo foi encontrado"""
+    in_view = np.zeros(n_rows, dtype=bool)
+    in_view[positions] = True
+    hits = pd.DataFrame({
+        'Termo': term_matches['terms'],
+        'Editais': [int(in_view[term_positions].sum()) for term_positions in term_matches['term_positions']]
+    })
+    return hits.sort_values('Editais', ascending=False)
+
+def matched_terms(term_matches, rows):
+    """Termos encontrados em cada uma das linhas 'rows' (posições), separados por '; '"""
+    found = [np.isin(rows, positions) for positions in term_matches['term_positions']]
+    return [
+        '; '.join(term for term, hit in zip(term_matches['terms'], row_hits) if hit)
+        for row_hits in zip(*found)
+    ] if found else [''] * len(rows)
+
+# Busca aproximada: similaridade mínima padrão (1 - distância de edição / maior comprimento)
+FUZZY_DEFAULT_SIMILARITY = 0.8
+
+def _trigrams(text):
+    """Trigramas distintos do texto, em ordem"""
+    return sorted({text[i:i + 3] for i in range(len(text) - 2)})
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_trigram_index(_search_index, dataset_version):
+    """Índice de trigramas do vocabulário (trigrama -> ids dos tokens), para busca aproximada e por trecho de palavra
+    
+    Cada token é delimitado por '$' ("obra" -> $ob, obr, bra, ra$), de modo que
+    início e fim de palavra tenham trigramas próprios.
+    """
+    vocabulary = _search_index['vocabulary']
+    grams, token_ids = [], []
+    for token_id, token in enumerate(vocabulary):
+        token_grams = _trigrams(f"${token}$")
+        grams.extend(token_grams)
+        token_ids.extend([token_id] * len(token_grams))
+    
+    gram_ids, gram_vocabulary = pd.factorize(pd.Series(grams, dtype=object))
+    order = np.argsort(gram_ids, kind='stable')
+    return {
+        'grams': {gram: gram_id for gram_id, gram in enumerate(gram_vocabulary)},
+        'offsets': np.concatenate([[0], np.cumsum(np.bincount(gram_ids, minlength=len(gram_vocabulary)))]),
+        'tokens': np.asarray(token_ids, dtype=np.int32)[order],
+        'lengths': vocabulary.str.len().to_numpy(dtype=np.int64)
+    }
+
+def _gram_tokens(trigram_index, gram):
+    """Ids (ordenados) dos tokens que contêm o trigrama"""
+    gram_id = trigram_index['grams'].get(gram)
+    if gram_id is None:
+        return np.empty(0, dtype=np.int32)
+    return trigram_index['tokens'][trigram_index['offsets'][gram_id]:trigram_index['offsets'][gram_id + 1]]
+
+def substring_token_ids(search_index, trigram_index, fragment):
+    """Ids dos tokens que contêm o fragmento: interseção das listas dos seus trigramas, conferida no vocabulário"""
+    vocabulary = search_index['vocabulary']
+    grams = _trigrams(fragment)
+    if not grams:
+        # Fragmento com menos de 3 caracteres: varredura do vocabulário
+        return np.flatnonzero(vocabulary.str.contains(fragment, regex=False).values)
+    
+    candidates = None
+    for gram in grams:
+        tokens = _gram_tokens(trigram_index, gram)
+        candidates = tokens if candidates is None else np.intersect1d(candidates, tokens, assume_unique=True)
+    found = vocabulary.iloc[candidates].str.contains(fragment, regex=False).to_numpy(dtype=bool)
+    return candidates[found]
+
+def edit_distances(fragment, chars, lengths, limits):
+    """Distância de Levenshtein do fragmento a vários tokens de uma vez (programação dinâmica vetorizada)
+    
+    'chars' traz os códigos dos caracteres dos tokens (uma linha por token), 'lengths' seus
+    comprimentos e 'limits' a distância máxima aceita para cada um: tokens cuja linha da
+    programação dinâmica já supera o limite são descartados (distância informada: limite + 1).
+    """
+    n_tokens, width = chars.shape
+    distances = np.asarray(limits) + 1
+    alive = np.arange(n_tokens)
+    # Uma coluna por token: as operações de cada passo são vetorizadas sobre os tokens
+    chars = chars.T
+    offsets = np.arange(width + 1, dtype=np.int16)[:, None]
+    previous = np.repeat(offsets, n_tokens, axis=1)
+    for i, char in enumerate(fragment, 1):
+        current = np.empty_like(previous)
+        current[0] = i
+        # Substituição e remoção vêm da linha anterior
+        current[1:] = np.minimum(previous[:-1] + (chars != ord(char)), previous[1:] + 1)
+        # Inserções (custo 1 por posição): current[j] = min(current[k] + j - k), um mínimo acumulado
+        current = np.minimum.accumulate(current - offsets, axis=0) + offsets
+        
+        # O mínimo da linha nunca diminui: acima do limite, o token já não é aceito
+        keep = current.min(axis=0) <= limits[alive]
+        if not keep.all():
+            alive, current, chars = alive[keep], current[:, keep], chars[:, keep]
+        previous = current
+    distances[alive] = previous[lengths[alive], np.arange(len(alive))]
+    return distances
+
+def fuzzy_token_ids(search_index, trigram_index, fragment, similarity):
+    """Ids dos tokens parecidos com o fragmento (1 - distância / maior comprimento >= similarity) ou que o contêm
+    
+    Antes da distância de edição, os candidatos são podados pelo comprimento compatível
+    com a similaridade e pela quantidade de trigramas em comum: cada edição altera no
+    máximo 3 trigramas. Quando as edições permitidas podem apagar todos os trigramas
+    (palavras curtas, similaridade baixa), vale apenas o filtro de comprimento.
+    """
+    lengths = trigram_index['lengths']
+    n = len(fragment)
+    max_edits = int((1 - similarity) * n / similarity + 1e-9)
+    in_range = (lengths >= np.ceil(n * similarity - 1e-9)) & (lengths <= n + max_edits)
+    
+    grams = _trigrams(f"${fragment}$")
+    gram_tokens = [_gram_tokens(trigram_index, gram) for gram in grams]
+    shared = np.bincount(np.concatenate(gram_tokens) if gram_tokens else np.empty(0, dtype=np.int32), minlength=len(lengths))
+    allowed_edits = np.floor((1 - similarity) * np.maximum(lengths, n) + 1e-9).astype(np.int64)
+    candidates = np.flatnonzero(in_range & (shared >= len(grams) - 3 * allowed_edits))
+    
+    if len(candidates):
+        # Matriz de caracteres só dos candidatos, cuja largura é limitada pelo filtro de comprimento
+        tokens = search_index['vocabulary'].iloc[candidates].tolist()
+        chars = np.array(tokens, dtype=str).view(np.uint32).reshape(len(tokens), -1)
+        limits = allowed_edits[candidates]
+        candidates = candidates[edit_distances(fragment, chars, lengths[candidates], limits) <= limits]
+    return np.union1d(candidates, substring_token_ids(search_index, trigram_index, fragment))
+
+# Colunas com bitmaps pré-calculados para os filtros da barra lateral
+BITMAP_COLUMNS = ['classificacao_final', 'Predição CIC', 'Predição STI', 'unidade', 'ente', 'modalidade', 'ano']
+
+def filter_value_key(value):
+    """Chave textual de um valor de filtro, no mesmo formato das opções da barra lateral"""
+    if isinstance(value, (int, float, np.integer, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_filter_bitmaps(_df, dataset_version):
+    """Pré-calcula um bitmap compactado (1 bit por linha) para cada valor das colunas de filtro"""
+    bitmaps = {}
+    for col in BITMAP_COLUMNS:
+        if col not in _df.columns:
+            continue
+        
+        codes, uniques = pd.factorize(_df[col])
+        bitmaps[col] = {
+            filter_value_key(value): np.packbits(codes == code)
+            for code, value in enumerate(uniques)
+        }
+    return bitmaps
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_value_index(_df, dataset_version):
+    """Índice ordenado de 'valor estimado' (argsort calculado uma única vez por versão dos dados)"""
+    if 'valor estimado' not in _df.columns:
+        return None
+    
+    raw_values = _df['valor estimado'].astype(float).values
+    # Mesmo tratamento do filtro por faixa: valores nulos contam como zero
+    values = np.nan_to_num(raw_values, nan=0.0)
+    order = np.argsort(values, kind='stable')
+    
+    has_values = not np.isnan(raw_values).all()
+    return {
+        'order': order,
+        'sorted_values': values[order],
+        'min': float(np.nanmin(raw_values)) if has_values else 0.0,
+        'max': float(np.nanmax(raw_values)) if has_values else 0.0
+    }
+
+def value_range_positions(value_index, min_val, max_val):
+    """Posições das linhas com valor na faixa, obtidas por duas buscas binárias (sem ordem definida)"""
+    start = np.searchsorted(value_index['sorted_values'], min_val, side='left')
+    end = np.searchsorted(value_index['sorted_values'], max_val, side='right')
+    return value_index['order'][start:end]
+
+# Linguagem de consulta: operadores (em maiúsculas) e campos aceitos em "campo:valor"
+QUERY_OPERATORS = {'AND': 'and', 'OR': 'or', 'NOT': 'not'}
+
+QUERY_FIELDS = {
+    'objeto': 'objeto',
+    'processada': 'objeto_processada',
+    'objeto_processada': 'objeto_processada',
+    'termos': 'todos_termos',
+    'todos_termos': 'todos_termos',
+    'observacoes': 'observacoes',
+    'situacao': 'descricao situacao edital',
+    'unidade': 'unidade',
+    'ente': 'ente',
+    'modalidade': 'modalidade',
+    'classificacao': 'classificacao_final',
+    'classificacao_final': 'classificacao_final',
+    'cic': 'Predição CIC',
+    'sti': 'Predição STI',
+    'ano': 'ano'
+}
+
+QUERY_TOKEN_PATTERN = re.compile(r'\s*(?:(?P<paren>[()])|(?P<separator>;)|(?:(?P<field>[^\s();:"]+):)?(?:"(?P<phrase>[^"]*)"?|(?P<word>[^\s();"]+)))')
+
+# Marcador da chave de filtro de uma consulta estruturada (não pode ser digitado na busca)
+QUERY_KEY_MARKER = '\x00consulta'
+
+def tokenize_query(search_term):
+    """Divide a consulta em parênteses, operadores e termos ('term', coluna ou None, texto normalizado, entre aspas)"""
+    tokens = []
+    text = search_term.strip()
+    position = 0
+    while position < len(text):
+        match = QUERY_TOKEN_PATTERN.match(text, position)
+        position = match.end()
+        if match.group('paren'):
+            tokens.append((match.group('paren'),))
+        elif match.group('separator'):
+            # ';' continua separando alternativas (OR), como na busca múltipla
+            tokens.append((';',))
+        elif match.group('phrase') is None and match.group('field') is None and match.group('word') in QUERY_OPERATORS:
+            tokens.append(('op', QUERY_OPERATORS[match.group('word')]))
+        else:
+            value = match.group('phrase') if match.group('phrase') is not None else match.group('word')
+            field = match.group('field')
+            column = QUERY_FIELDS.get(normalize_search_text(field)) if field else None
+            if field and column is None:
+                # Campo desconhecido: "abc:def" é tratado como texto comum
+                value = f"{field}:{value}"
+            value = normalize_search_text(value).strip()
+            if not value:
+                raise ValueError("termo vazio entre aspas")
+            tokens.append(('term', column, value, match.group('phrase') is not None))
+    return tokens
+
+def is_boolean_query(search_term):
+    """Indica se a busca usa a linguagem de consulta (AND/OR/NOT, "frase" ou campo:valor)"""
+    try:
+        tokens = tokenize_query(search_term)
+    except ValueError:
+        return True
+    return any(
+        token[0] == 'op' or token[0] == 'term' and (token[1] is not None or token[3])
+        for token in tokens
+    )
+
+def _parse_or(tokens, position):
+    children = []
+    while True:
+        node, position = _parse_and(tokens, position)
+        children.append(node)
+        if position < len(tokens) and tokens[position] in (('op', 'or'), (';',)):
+            position += 1
+        else:
+            break
+    return (children[0] if len(children) == 1 else ('or', tuple(children))), position
+
+def _parse_and(tokens, position):
+    children = []
+    while position < len(tokens) and tokens[position] not in (('op', 'or'), (';',), (')',)):
+        if tokens[position] == ('op', 'and'):
+            # AND explícito; termos lado a lado também são combinados por AND
+            position += 1
+            continue
+        node, position = _parse_unary(tokens, position)
+        children.append(node)
+    if not children:
+        raise ValueError("falta um termo junto a um operador ou parêntese")
+    return (children[0] if len(children) == 1 else ('and', tuple(children))), position
+
+def _parse_unary(tokens, position):
+    if position >= len(tokens):
+        raise ValueError("consulta incompleta")
+    token = tokens[position]
+    if token == ('op', 'not'):
+        node, position = _parse_unary(tokens, position + 1)
+        return ('not', node), position
+    if token == ('(',):
+        node, position = _parse_or(tokens, position + 1)
+        # Parêntese não fechado é fechado no fim da consulta
+        if position < len(tokens) and tokens[position] == (')',):
+            position += 1
+        return node, position
+    if token[0] == 'term':
+        return token[:3], position + 1
+    raise ValueError("falta um termo junto a um operador ou parêntese")
+
+def parse_query(search_term):
+    """Árvore sintática da consulta: ('term', coluna, texto), ('and'|'or', filhos) ou ('not', filho)
+    
+    Precedência: NOT > AND (explícito ou implícito entre termos) > OR (ou ;).
+    """
+    tokens = tokenize_query(search_term)
+    if not tokens:
+        raise ValueError("consulta vazia")
+    node, position = _parse_or(tokens, 0)
+    if position < len(tokens):
+        raise ValueError("parêntese ')' sem o '(' correspondente")
+    return node
+
+def compile_query(node, columns):
+    """Plano de execução da consulta: escolhe o acesso de cada termo e reordena as operações
+    
+    Termos sem campo usam o índice invertido; campos categóricos, os bitmaps dos filtros;
+    campos de texto, candidatos do índice conferidos por busca literal (sem regex) na coluna.
+    Em um AND, os NOT viram subtrações do resultado dos demais termos.
+    """
+    kind = node[0]
+    if kind == 'term':
+        _, column, text = node
+        if column is None:
+            return {'op': 'index', 'text': text}
+        if column not in columns:
+            return {'op': 'empty', 'column': column, 'text': text}
+        if column in BITMAP_COLUMNS:
+            return {'op': 'bitmap', 'column': column, 'text': text}
+        return {'op': 'scan', 'column': column, 'text': text}
+    if kind == 'not':
+        return {'op': 'not', 'child': compile_query(node[1], columns)}
+    
+    children = [compile_query(child, columns) for child in node[1]]
+    if kind == 'or':
+        return {'op': 'or', 'children': children}
+    return {
+        'op': 'and',
+        'include': [child for child in children if child['op'] != 'not'],
+        'exclude': [child['child'] for child in children if child['op'] == 'not']
+    }
+
+def describe_query_plan(plan, depth=0):
+    """Texto do plano de execução, uma operação por linha"""
+    indent = '  ' * depth
+    op = plan['op']
+    if op == 'index':
+        return f"{indent}índice invertido: '{plan['text']}'"
+    if op == 'bitmap':
+        return f"{indent}bitmaps de {plan['column']}: valores com '{plan['text']}'"
+    if op == 'scan':
+        return f"{indent}índice + busca literal em {plan['column']}: '{plan['text']}'"
+    if op == 'empty':
+        return f"{indent}coluna {plan['column']} ausente: nenhuma linha"
+    if op == 'not':
+        return f"{indent}complemento de:\n" + describe_query_plan(plan['child'], depth + 1)
+    if op == 'or':
+        return f"{indent}união de:\n" + '\n'.join(describe_query_plan(child, depth + 1) for child in plan['children'])
+    
+    lines = [f"{indent}interseção de:" if plan['include'] else f"{indent}todas as linhas"]
+    lines += [describe_query_plan(child, depth + 1) for child in plan['include']]
+    if plan['exclude']:
+        lines.append(f"{indent}menos:")
+        lines += [describe_query_plan(child, depth + 1) for child in plan['exclude']]
+    return '\n'.join(lines)
+
+def _query_shadow_column(df, column, search_index):
+    """Coluna-sombra normalizada: do cache da versão quando há índice, senão calculada na hora"""
+    if search_index is not None:
+        return build_search_columns(df, search_index['version'])[column]
+    return normalize_search_series(df[column])
+
+def _bitmap_positions(df, column, text, filter_bitmaps):
+    """Linhas cujo valor da coluna contém o texto (ano: igualdade), pela união dos bitmaps dos valores"""
+    def selected(key):
+        return key == text if column == 'ano' else text in normalize_search_text(key)
+    
+    if filter_bitmaps is not None and column in filter_bitmaps:
+        bitmaps = [bitmap for key, bitmap in filter_bitmaps[column].items() if selected(key)]
+        if not bitmaps:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(np.unpackbits(np.bitwise_or.reduce(bitmaps), count=len(df)))
+    
+    codes, uniques = pd.factorize(df[column])
+    matched = [code for code, value in enumerate(uniques) if selected(filter_value_key(value))]
+    return np.flatnonzero(np.isin(codes, matched))
+
+def execute_query_plan(plan, df, search_index=None, filter_bitmaps=None):
+    """Executa o plano como operações de conjunto sobre arrays ordenados de posições"""
+    op = plan['op']
+    n_rows = len(df)
+    if op == 'index':
+        if search_index is not None:
+            return cached_term_matches(search_index, search_index['version'], (plan['text'],))['positions']
+        search_mask = np.zeros(n_rows, dtype=bool)
+        for column in SEARCH_COLUMNS:
+            if column in df.columns:
+                search_mask |= normalize_search_series(df[column]).astype(str).str.contains(plan['text'], regex=False).to_numpy(dtype=bool)
+        return np.flatnonzero(search_mask)
+    if op == 'bitmap':
+        return _bitmap_positions(df, plan['column'], plan['text'], filter_bitmaps)
+    if op == 'scan':
+        shadow = _query_shadow_column(df, plan['column'], search_index)
+        if search_index is not None:
+            # O texto do índice junta todas as colunas de busca: seus candidatos contêm as linhas da coluna
+            candidates = cached_term_matches(search_index, search_index['version'], (plan['text'],))['positions']
+        else:
+            candidates = np.arange(n_rows)
+        found = shadow.iloc[candidates].astype(str).str.contains(plan['text'], regex=False).to_numpy(dtype=bool)
+        return candidates[found]
+    if op == 'empty':
+        return np.empty(0, dtype=np.int64)
+    if op == 'not':
+        return np.setdiff1d(np.arange(n_rows), execute_query_plan(plan['child'], df, search_index, filter_bitmaps), assume_unique=True)
+    if op == 'or':
+        return np.unique(np.concatenate([
+            execute_query_plan(child, df, search_index, filter_bitmaps) for child in plan['children']
+        ]))
+    
+    positions = None
+    for child in plan['include']:
+        child_positions = execute_query_plan(child, df, search_index, filter_bitmaps)
+        positions = child_positions if positions is None else np.intersect1d(positions, child_positions, assume_unique=True)
+        if len(positions) == 0:
+            return positions
+    if positions is None:
+        positions = np.arange(n_rows)
+    for child in plan['exclude']:
+        positions = np.setdiff1d(positions, execute_query_plan(child, df, search_index, filter_bitmaps), assume_unique=True)
+    return positions
+
+def filter_positions(df, search_term, filters, search_index=None, filter_bitmaps=None, value_index=None):
+    """Calcula as posições das linhas que atendem à busca e aos filtros, sem copiar o dataframe"""
+    n_rows = len(df)
+    mask = np.ones(n_rows, dtype=bool)
     
     # Aplicar busca por termo livre (suporte a múltiplos termos separados por ;)
     if search_term:
-        search_columns = ['objeto', 'unidade', 'observacoes', 'todos_termos', 'descricao situacao edital', 'objeto_processada']
         # Filtra apenas colunas que existem no DataFrame
-        search_columns = [col for col in search_columns if col in df.columns]
-        
-        if search_columns:  # Só procede se houver colunas para buscar
+        search_columns = [col for col in SEARCH_COLUMNS if col in df.columns]
+        
+        if search_columns and is_boolean_query(search_term):
+            # Linguagem de consulta: plano de operações de conjunto sobre índice, bitmaps e buscas literais
+            plan = compile_query(parse_query(search_term), df.columns)
+            search_mask = np.zeros(n_rows, dtype=bool)
+            search_mask[execute_query_plan(plan, df, search_index, filter_bitmaps)] = True
+            mask &= search_mask
+        elif search_columns:  # Só procede se houver colunas para buscar
             # Verifica se há múltiplos termos separados por ponto e vírgula
             if ';' in search_term:
-                search_terms = [term.strip().lower() for term in search_term.split(';') if term.strip()]
-                
+                search_terms = [normalize_search_text(term.strip()) for term in search_term.split(';') if term.strip()]
+            else:
+                # Busca por termo único
+                search_terms = [normalize_search_text(search_term.strip())]
+            
+            search_mask = np.zeros(n_rows, dtype=bool)
+            if search_index is not None:
+                # Busca pelo índice invertido construído no carregamento
+                search_mask[search_index_lookup(search_index, search_terms, filters.get('similaridade'))] = True
+            else:
                 # Cria máscara para buscar qualquer um dos termos (OR logic)
-                mask = pd.Series(False, index=filtered_df.index)
                 for term in search_terms:
-                    term_mask = pd.Series(False, index=filtered_df.index)
                     for col in search_columns:
-                        # Converte a coluna para string e trata valores nulos
-                        term_mask |= filtered_df[col].fillna('').astype(str).str.lower().str.contains(term, na=False)
-                    mask |= term_mask
-                
-                filtered_df = filtered_df[mask]
-            else:
-                # Busca por termo único
-                mask = pd.Series(False, index=filtered_df.index)
-                search_term = search_term.lower().strip()
-                for col in search_columns:
-                    # Converte a coluna para string e trata valores nulos
-                    mask |= filtered_df[col].fillna('').astype(str).str.lower().str.contains(search_term, na=False)
-                filtered_df = filtered_df[mask]
-    
-    # Aplicar filtros específicos
+                        # Normaliza a coluna (minúsculas, sem acentos) e trata valores nulos
+                        search_mask |= normalize_search_series(df[col]).astype(str).str.contains(term, na=False, regex=False).to_numpy(dtype=bool)
+            mask &= search_mask
+    
+    # Filtros com bitmap pré-calculado: combinados por AND sobre os bits compactados
+    packed = None
     for column, value in filters.items():
-        if value not in ['Todas', 'Todos'] and column in filtered_df.columns:
-            if column == 'valor_range':
-                min_val, max_val = value
-                filtered_df = filtered_df[
-                    (filtered_df['valor estimado'].fillna(0).astype(float) >= min_val) & 
-                    (filtered_df['valor estimado'].fillna(0).astype(float) <= max_val)
-                ]
+        if value not in ['Todas', 'Todos'] and column in df.columns:
+            if filter_bitmaps is not None and column in filter_bitmaps:
+                bitmap = filter_bitmaps[column].get(filter_value_key(value))
+                if bitmap is None:
+                    # Valor inexistente na base: nenhuma linha atende
+                    return np.empty(0, dtype=np.int64)
+                packed = bitmap if packed is None else packed & bitmap
             elif column == 'ano':
                 # Trata o ano como número
-                filtered_df = filtered_df[filtered_df[column].fillna(0).astype(float) == float(value)]
+                mask &= df[column].fillna(0).astype(float).values == float(value)
+            elif isinstance(df[column].dtype, pd.CategoricalDtype):
+                # Colunas categóricas: compara os códigos inteiros
+                code = df[column].cat.categories.get_indexer([str(value)])[0]
+                # Valor fora do vocabulário (código -1 representa nulos) não seleciona nada
+                mask &= (df[column].cat.codes.values == code) & (code >= 0)
             else:
                 # Para outros campos, faz comparação de strings
-                filtered_df = filtered_df[filtered_df[column].fillna('').astype(str) == str(value)]
+                mask &= (df[column].fillna('').astype(str) == str(value)).values
+    
+    if packed is not None:
+        mask &= np.unpackbits(packed, count=n_rows).astype(bool)
+    
+    # Faixa de valor estimado - a faixa completa do slider não filtra nada
+    value_range = filters.get('valor_range')
+    if value_range is not None and 'valor estimado' in df.columns:
+        min_val, max_val = value_range
+        if value_index is not None:
+            if min_val > value_index['min'] or max_val < value_index['max']:
+                # Duas buscas binárias no índice ordenado; só as linhas da faixa são conferidas
+                candidates = value_range_positions(value_index, min_val, max_val)
+                return np.sort(candidates[mask[candidates]])
+        else:
+            valores = df['valor estimado'].astype(float).values
+            if not np.isnan(valores).all() and (min_val > np.nanmin(valores) or max_val < np.nanmax(valores)):
+                valores = np.nan_to_num(valores, nan=0.0)
+                mask &= (valores >= min_val) & (valores <= max_val)
+    
+    return np.flatnonzero(mask)
+
+# Quantidade máxima de resultados de filtro mantidos em cache (compartilhado entre sessões)
+FILTER_CACHE_ENTRIES = 128
+
+def canonical_filter_key(search_term, filters, value_index=None):
+    """Forma canônica da busca e dos filtros, usada como chave do cache de resultados
+    
+    Termos são normalizados, deduplicados e ordenados (a busca é OR); filtros inativos
+    e a faixa de valor completa são descartados. Uma consulta estruturada é validada
+    (ValueError se a sintaxe for inválida) e guardada com espaços normalizados.
+    """
+    terms = ()
+    if search_term and is_boolean_query(search_term):
+        parse_query(search_term)
+        terms = (QUERY_KEY_MARKER, ' '.join(search_term.split()))
+    elif search_term:
+        raw_terms = search_term.split(';') if ';' in search_term else [search_term]
+        terms = tuple(sorted({normalize_search_text(term.strip()) for term in raw_terms if term.strip()}))
+    
+    active_filters = []
+    for column, value in filters.items():
+        if column == 'valor_range':
+            min_val, max_val = value
+            if value_index is None or min_val > value_index['min'] or max_val < value_index['max']:
+                active_filters.append((column, (float(min_val), float(max_val))))
+        elif column == 'similaridade':
+            # A busca aproximada só altera o resultado de termos livres
+            if value and terms and not is_query_key(terms):
+                active_filters.append((column, round(float(value), 2)))
+        elif value not in ['Todas', 'Todos']:
+            active_filters.append((column, filter_value_key(value)))
+    
+    return terms, tuple(sorted(active_filters))
+
+def is_query_key(terms):
+    """Indica se os termos de uma chave de filtro são uma consulta estruturada"""
+    return len(terms) == 2 and terms[0] == QUERY_KEY_MARKER
+
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES, show_spinner=False)
+def cached_term_matches(_search_index, dataset_version, terms, similarity=None):
+    """Resultado de match_terms memorizado por (versão dos dados, termos, similaridade), compartilhado entre sessões"""
+    return match_terms(_search_index, list(terms), similarity)
+
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES, show_spinner=False)
+def cached_filter_positions(_df, dataset_version, filter_key, _search_index=None, _filter_bitmaps=None, _value_index=None):
+    """Posições das linhas filtradas, memorizadas por (versão dos dados, busca, filtros) com descarte LRU"""
+    terms, active_filters = filter_key
+    search_term = terms[1] if is_query_key(terms) else ';'.join(terms)
+    positions = filter_positions(_df, search_term, dict(active_filters), _search_index, _filter_bitmaps, _value_index)
+    
+    # Array compartilhado entre sessões: compacto e somente leitura
+    positions = positions.astype(np.int32)
+    positions.setflags(write=False)
+    return positions
+
+# Dimensões do cubo de agregados do dashboard (as mesmas dos filtros da barra lateral)
+CUBE_DIMENSIONS = ['classificacao_final', 'Predição CIC', 'Predição STI', 'unidade', 'ente', 'modalidade', 'ano']
+# Medidas aditivas do cubo - médias são derivadas de soma / contagem
+CUBE_MEASURES = ['linhas', 'valor_count', 'valor_sum', 'pontuacao_count', 'pontuacao_sum', 'multiplas_categorias']
+# Agrupamentos exibidos no dashboard
+DASHBOARD_GROUPS = ['unidade', 'ano', 'classificacao_final']
+
+def build_measure_frame(df, dimensions):
+    """Monta as dimensões e as medidas aditivas (contagens e somas) de cada linha"""
+    data = pd.DataFrame({col: df[col] for col in dimensions}, index=df.index)
+    data['linhas'] = 1
+    for measure, col in [('valor', 'valor estimado'), ('pontuacao', 'pontuacao')]:
+        values = df[col].astype(float) if col in df.columns else pd.Series(np.nan, index=df.index)
+        data[f"{measure}_count"] = values.notna().astype(int)
+        data[f"{measure}_sum"] = values.fillna(0)
+    if 'quantidade_categorias' in df.columns:
+        data['multiplas_categorias'] = (df['quantidade_categorias'] > 1).astype(int)
+    else:
+        data['multiplas_categorias'] = 0
+    return data
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_aggregate_cube(_df, dataset_version):
+    """Pré-agrega contagens e somas sobre todas as combinações das dimensões de filtro"""
+    dimensions = [col for col in CUBE_DIMENSIONS if col in _df.columns]
+    if not dimensions:
+        return None
+    
+    data = build_measure_frame(_df, dimensions)
+    return data.groupby(dimensions, observed=True, dropna=False, sort=False)[CUBE_MEASURES].sum().reset_index()
+
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES, show_spinner=False)
+def cached_filtered_measures(_df, dataset_version, filter_key, _positions):
+    """Medidas das linhas filtradas agregadas pelas dimensões do cubo, memorizadas como cached_filter_positions
+    
+    Lê apenas as colunas das dimensões e das medidas, nas posições filtradas.
+    """
+    dimensions = [col for col in CUBE_DIMENSIONS if col in _df.columns]
+    columns = dimensions + [col for col in ['valor estimado', 'pontuacao', 'quantidade_categorias'] if col in _df.columns]
+    data = build_measure_frame(_df[columns].iloc[_positions], dimensions)
+    if not dimensions:
+        return data
+    return data.groupby(dimensions, observed=True, dropna=False, sort=False)[CUBE_MEASURES].sum().reset_index()
+
+def aggregate_source(store, filter_key, positions):
+    """Medidas aditivas da visão filtrada, por combinação das dimensões
+    
+    Com apenas filtros categóricos ativos, o cubo pré-calculado é filtrado;
+    com busca por termo ou faixa de valor, as linhas filtradas ('positions') são
+    agregadas uma vez por (versão dos dados, filtros) em cached_filtered_measures.
+    """
+    terms, active_filters = filter_key
+    cube = store.get('cube')
+    
+    if cube is not None and not terms and all(column != 'valor_range' for column, _ in active_filters):
+        return cube.iloc[filter_positions(cube, '', dict(active_filters))]
+    return cached_filtered_measures(store['df'], store['version'], filter_key, positions)
+
+def dashboard_aggregates(store, data):
+    """Agregados do dashboard por unidade, ano e classificação, a partir de aggregate_source"""
+    aggregates = {
+        by: data.groupby(by, observed=True)[CUBE_MEASURES].sum()
+        for by in DASHBOARD_GROUPS if by in data.columns
+    }
+    aggregates['has_valor'] = 'valor estimado' in store['df'].columns
+    aggregates['has_pontuacao'] = 'pontuacao' in store['df'].columns
+    return aggregates
+
+def dataset_statistics(data, has_category_counts=True):
+    """Indicadores gerais (editais, valor total, categorias, unidades, editais em múltiplas categorias, divergências)
+    
+    Calculados sobre as medidas agregadas - o cubo completo para a base ou
+    aggregate_source para a visão filtrada.
+    """
+    data = data[data['linhas'] > 0]
+    total = int(data['linhas'].sum())
+    
+    original_column = 'Predição STI' if 'Predição STI' in data.columns else 'classificacao_final'
+    original_categories = set(data[original_column].dropna().unique()) if original_column in data.columns else set()
+    final_categories = set(data['classificacao_final'].dropna().unique()) if 'classificacao_final' in data.columns else set()
+    
+    statistics = {
+        'total_editais': total,
+        'valor_total': float(data['valor_sum'].sum()),
+        'categorias': len(original_categories),
+        'novas_categorias': len(final_categories - original_categories),
+        'unidades': data['unidade'].nunique() if 'unidade' in data.columns else 0,
+        'multiplas_categorias': None,
+        'categoria_unica': None,
+        'divergencias': None
+    }
+    if 'Predição CIC' in data.columns and 'Predição STI' in data.columns:
+        divergent = (data['Predição CIC'] != data['Predição STI']).to_numpy()
+        statistics['divergencias'] = int(data['linhas'].to_numpy()[divergent].sum())
+    if has_category_counts:
+        statistics['multiplas_categorias'] = int(data['multiplas_categorias'].sum())
+        statistics['categoria_unica'] = total - statistics['multiplas_categorias']
+    return statistics
+
+def confusion_matrix(data):
+    """Matriz de confusão Predição CIC × Predição STI (quantidade de editais), a partir de aggregate_source"""
+    if 'Predição CIC' not in data.columns or 'Predição STI' not in data.columns:
+        return None
+    counts = data.groupby(['Predição CIC', 'Predição STI'], observed=True)['linhas'].sum()
+    return counts[counts > 0].unstack(fill_value=0)
+
+def divergent_pairs(matrix):
+    """Pares (Predição CIC, Predição STI) divergentes, do mais frequente para o menos frequente"""
+    if matrix is None:
+        return pd.Series(dtype=int)
+    pairs = matrix.stack()
+    pairs = pairs[(pairs > 0) & (pairs.index.get_level_values(0) != pairs.index.get_level_values(1))]
+    return pairs.sort_values(ascending=False)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_divergence_flags(_df, dataset_version):
+    """Indicador, por linha, de divergência entre 'Predição CIC' e 'Predição STI' (somente leitura)"""
+    if 'Predição CIC' not in _df.columns or 'Predição STI' not in _df.columns:
+        return None
+    flags = (_df['Predição CIC'] != _df['Predição STI']).to_numpy()
+    flags.setflags(write=False)
+    return flags
+
+# Editais semelhantes: coluna de texto usada nos vetores TF-IDF (a primeira disponível) e colunas do resultado
+SIMILARITY_TEXT_COLUMNS = ['objeto_processada', 'objeto']
+
+SIMILAR_RESULT_COLUMNS = ['objeto', 'unidade', 'ano', 'Predição CIC', 'Predição STI', 'valor estimado']
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def build_similarity_index(_df, dataset_version):
+    """Vetores TF-IDF esparsos (normalizados L2) do texto de cada edital, construídos uma vez por versão dos dados
+    
+    TF sublinear (1 + log tf) e IDF suavizado (log((1 + n) / (1 + df)) + 1); o produto
+    escalar entre dois vetores é a similaridade de cosseno entre os editais.
+    """
+    column = next((col for col in SIMILARITY_TEXT_COLUMNS if col in _df.columns), None)
+    if sparse is None or column is None:
+        return None
+    
+    text = build_search_columns(_df, dataset_version)[column].astype(str).reset_index(drop=True)
+    tokens = text.str.findall(TOKEN_PATTERN).explode().dropna()
+    term_ids, vocabulary = pd.factorize(tokens.values)
+    counts = sparse.csr_matrix(
+        (np.ones(len(term_ids), dtype=np.float32), (tokens.index.values, term_ids)),
+        shape=(len(text), len(vocabulary))
+    )
+    counts.sum_duplicates()
+    
+    document_frequency = np.bincount(counts.indices, minlength=len(vocabulary))
+    idf = (np.log((1 + len(text)) / (1 + document_frequency)) + 1).astype(np.float32)
+    return {
+        'version': dataset_version,
+        'column': column,
+        'vocabulary': pd.Index(vocabulary),
+        'idf': idf,
+        'counts': counts,
+        'matrix': _tfidf_rows(counts, idf)
+    }
+
+def _tfidf_rows(counts, idf):
+    """Pesos TF-IDF normalizados L2 por linha, a partir das contagens de termos (CSR)"""
+    matrix = counts.astype(np.float32)
+    matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    # Textos sem nenhum termo ficam com vetor nulo (similaridade zero com todos)
+    matrix.data /= np.repeat(np.where(norms > 0, norms, 1), np.diff(matrix.indptr))
+    return matrix
+
+def text_similarity_vector(similarity_index, text):
+    """Vetor TF-IDF (1 × vocabulário) de um texto livre, com o vocabulário e o IDF da base"""
+    tokens = re.findall(TOKEN_PATTERN, normalize_search_text(text))
+    term_ids = similarity_index['vocabulary'].get_indexer(tokens)
+    term_ids = term_ids[term_ids >= 0]
+    counts = sparse.csr_matrix(
+        (np.ones(len(term_ids), dtype=np.float32), (np.zeros(len(term_ids), dtype=np.int64), term_ids)),
+        shape=(1, len(similarity_index['vocabulary']))
+    )
+    counts.sum_duplicates()
+    return _tfidf_rows(counts, similarity_index['idf'])
+
+def top_similar(similarity_index, queries, k, allowed=None, exclude=None):
+    """Os k editais mais semelhantes a cada consulta (linhas de 'queries'), pelo cosseno entre os vetores
+    
+    Um único produto esparso pontua todas as consultas contra a base. 'allowed' restringe o
+    resultado a essas posições; 'exclude' traz, por consulta, a posição a descartar (o próprio
+    edital) ou -1. Retorna uma lista de (posições, similaridades) em ordem decrescente.
+    """
+    scores = (similarity_index['matrix'] @ queries.T).T.toarray()
+    if allowed is not None:
+        outside = np.ones(scores.shape[1], dtype=bool)
+        outside[allowed] = False
+        scores[:, outside] = 0
+    
+    results = []
+    for query_id, query_scores in enumerate(scores):
+        if exclude is not None and exclude[query_id] >= 0:
+            query_scores[exclude[query_id]] = 0
+        top = np.argpartition(-query_scores, min(k, len(query_scores)) - 1)[:k] if k < len(query_scores) else np.arange(len(query_scores))
+        top = top[np.argsort(-query_scores[top], kind='stable')]
+        top = top[query_scores[top] > 0]
+        results.append((top, query_scores[top]))
+    return results
+
+# Classificador por regras: rótulo dos editais sem pontuação e parâmetros das regras sugeridas
+RULES_UNCLASSIFIED = 'Sem classificação'
+
+RULES_SUGGESTED_TERMS = 10
+
+RULES_MIN_SUPPORT = 5
+
+def parse_classification_rules(rules_text):
+    """Lê as regras em JSON ({categoria: {termo: peso}}) e devolve sua forma canônica, usada como chave de cache
     
-    return filtered_df
+    Listas de termos valem peso 1. Termos são normalizados (minúsculas, sem acentos);
+    ValueError descreve o problema quando o formato é inválido.
+    """
+    try:
+        rules = json.loads(rules_text)
+    except json.JSONDecodeError as error:
+        raise ValueError(f"JSON inválido (linha {error.lineno}): {error.msg}")
+    if not isinstance(rules, dict) or not rules:
+        raise ValueError("as regras devem ser um objeto {categoria: {termo: peso}}")
+    
+    canonical = []
+    for category, terms in rules.items():
+        if category == RULES_UNCLASSIFIED:
+            raise ValueError(f"'{RULES_UNCLASSIFIED}' é reservado para editais sem pontuação")
+        if isinstance(terms, list):
+            terms = {term: 1 for term in terms}
+        if not isinstance(terms, dict):
+            raise ValueError(f"categoria '{category}': use {{termo: peso}} ou uma lista de termos")
+        
+        weights = []
+        for term, weight in terms.items():
+            if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+                raise ValueError(f"categoria '{category}', termo '{term}': o peso deve ser numérico")
+            term = normalize_search_text(term).strip()
+            if term:
+                weights.append((term, float(weight)))
+        canonical.append((str(category), tuple(sorted(weights))))
+    return tuple(canonical)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def suggest_classification_rules(_df, dataset_version):
+    """Regras iniciais a partir da base: para cada categoria da Predição CIC, as palavras do texto
+    classificado (o mesmo de classify_by_rules) mais associadas a ela, com peso igual à fração dos
+    editais com a palavra que estão na categoria"""
+    similarity_index = build_similarity_index(_df, dataset_version)
+    if similarity_index is None or 'Predição CIC' not in _df.columns:
+        return {}
+    
+    # Editais com cada palavra, por categoria: matriz de presença (editais × vocabulário) transposta × categorias
+    codes, categories = category_codes(_df['Predição CIC'])
+    rows = np.flatnonzero(codes >= 0)
+    membership = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, codes[rows])),
+        shape=(len(codes), len(categories))
+    )
+    counts = np.asarray((similarity_index['counts'].sign().T @ membership).todense())
+    shares = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+    
+    vocabulary = similarity_index['vocabulary']
+    rules = {}
+    for category_id, category in enumerate(categories):
+        eligible = np.flatnonzero(counts[:, category_id] >= RULES_MIN_SUPPORT)
+        order = np.lexsort((-counts[eligible, category_id], -shares[eligible, category_id]))
+        top = eligible[order[:RULES_SUGGESTED_TERMS]]
+        if len(top):
+            rules[str(category)] = {vocabulary[token_id]: round(float(shares[token_id, category_id]), 2) for token_id in top}
+    return rules
+
+def category_codes(series):
+    """Códigos inteiros (-1 para nulos) e categorias de uma coluna, sem converter os valores para texto"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    codes, uniques = pd.factorize(series)
+    return codes, pd.Index(uniques)
+
+def _rule_token_ids(vocabulary, word, prefix=False):
+    """Ids do vocabulário para uma palavra das regras: a própria palavra ou, com prefixo, as que começam com ela"""
+    if prefix:
+        return np.flatnonzero(vocabulary.str.startswith(word))
+    token_ids = vocabulary.get_indexer([word])
+    return token_ids[token_ids >= 0]
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def classify_by_rules(_df, dataset_version, rules):
+    """Pontua todos os editais contra todas as categorias das regras em uma única passada vetorizada
+    
+    A matriz termo-documento binária (editais × vocabulário, a mesma dos vetores TF-IDF) é
+    multiplicada pela matriz de pesos (vocabulário × categorias): cada termo presente soma seu
+    peso à categoria. Termos terminados em '*' valem para todas as palavras com esse prefixo
+    (em frases, a última palavra); frases são conferidas por busca literal apenas nas linhas
+    que têm todas as suas palavras.
+    Retorna {'categories', 'labels' (categoria de maior pontuação ou RULES_UNCLASSIFIED), 'scores'}.
+    """
+    similarity_index = build_similarity_index(_df, dataset_version)
+    if similarity_index is None:
+        return None
+    
+    vocabulary = similarity_index['vocabulary']
+    presence = similarity_index['counts'].sign()
+    categories = [category for category, _ in rules]
+    
+    weights = np.zeros((len(vocabulary), len(categories)), dtype=np.float64)
+    phrases = []
+    for category_id, (_, category_weights) in enumerate(rules):
+        for term, weight in category_weights:
+            prefix = term.endswith('*')
+            term = term.rstrip('*')
+            words = re.findall(TOKEN_PATTERN, term)
+            if words == [term]:
+                weights[_rule_token_ids(vocabulary, term, prefix), category_id] += weight
+            elif words:
+                phrases.append((term, words, prefix, category_id, weight))
+    
+    scores = np.asarray(presence @ weights)
+    if phrases:
+        columns = presence.tocsc()
+        text = build_search_columns(_df, dataset_version)[similarity_index['column']].astype(str).reset_index(drop=True)
+        for term, words, prefix, category_id, weight in phrases:
+            candidates = None
+            for word_id, word in enumerate(words):
+                token_ids = _rule_token_ids(vocabulary, word, prefix and word_id == len(words) - 1)
+                rows = np.unique(np.concatenate(
+                    [columns.indices[columns.indptr[token_id]:columns.indptr[token_id + 1]] for token_id in token_ids]
+                    or [np.empty(0, dtype=np.int32)]
+                ))
+                candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+            found = candidates[text.iloc[candidates].str.contains(term, regex=False).to_numpy(dtype=bool)]
+            scores[found, category_id] += weight
+    
+    # Arredondamento: somas iguais em outra ordem empatam, e o empate fica com a primeira categoria das regras
+    scores = scores.round(6)
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(scores)), best]
+    labels = pd.Categorical.from_codes(
+        np.where(best_scores > 0, best, len(categories)),
+        categories + [RULES_UNCLASSIFIED]
+    )
+    best_scores.setflags(write=False)
+    return {'categories': categories, 'labels': labels, 'scores': best_scores}
+
+def format_number_br(value, decimals=0):
+    """Formata um número no padrão brasileiro (1.234,56)"""
+    return f"{value:,.{decimals}f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+def format_brl_compact(value):
+    """Valor monetário abreviado (R$ 244 Bilhões, R$ 3,5 Milhões)"""
+    for scale, name in [(1e12, 'Trilhões'), (1e9, 'Bilhões'), (1e6, 'Milhões'), (1e3, 'Mil')]:
+        if abs(value) >= scale:
+            scaled = value / scale
+            return f"R$ {format_number_br(scaled, 0 if abs(scaled) >= 100 else 1)} {name}"
+    return f"R$ {format_number_br(value, 2)}"
+
+def format_share(count, total):
+    """Percentual de count em total no padrão brasileiro (16,35%)"""
+    return f"{format_number_br(count / total * 100 if total else 0, 2)}%"
 
-def create_charts(df):
-    """Cria gráficos de análise"""
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_dataset_store(_df, dataset_version, _search_index=None):
+    """Base e índices compartilhados por todas as sessões do processo (somente leitura)
+    
+    Cada sessão recebe o mesmo objeto, sem cópias; as visões filtradas são
+    representadas pelas posições das linhas. '_search_index' permite fornecer um
+    índice de busca já atualizado de forma incremental.
+    """
+    cube = build_aggregate_cube(_df, dataset_version)
+    return {
+        'df': _df,
+        'version': dataset_version,
+        'search_index': _search_index if _search_index is not None else build_search_index(_df, dataset_version),
+        'filter_bitmaps': build_filter_bitmaps(_df, dataset_version),
+        'value_index': build_value_index(_df, dataset_version),
+        'cube': cube,
+        'divergence_flags': build_divergence_flags(_df, dataset_version),
+        'statistics': dataset_statistics(
+            cube if cube is not None else build_measure_frame(_df, []),
+            'quantidade_categorias' in _df.columns
+        )
+    }
+
+def store_filter_positions(store, filter_key):
+    """Posições das linhas filtradas da base compartilhada, via cache de resultados"""
+    return cached_filter_positions(
+        store['df'],
+        store['version'],
+        filter_key,
+        store['search_index'],
+        store['filter_bitmaps'],
+        store['value_index']
+    )
+
+def create_charts(aggregates):
+    """Cria gráficos de análise a partir dos agregados do dashboard"""
     col1, col2 = st.columns(2)
     
     with col1:
-        if 'unidade' in df.columns and len(df) > 0:
+        if 'unidade' in aggregates:
             # Gráfico de quantidade de editais por coordenadoria
-            unidade_counts = df['unidade'].value_counts().head(10)
+            unidade_counts = aggregates['unidade']['linhas'].sort_values(ascending=False).head(10)
+            unidade_counts = unidade_counts[unidade_counts > 0]
             
             if len(unidade_counts) > 0:
                 fig_bar = px.bar(
                     x=unidade_counts.values,
-                    y=unidade_counts.index,
+                    y=unidade_counts.index.astype(str),
                     orientation='h',
                     title="📊 Quantidade de Editais por Coordenadoria",
                     labels={'x': 'Quantidade', 'y': 'Coordenadoria'},
@@ -361,23 +2273,24 @@ def create_charts(df):
                 st.plotly_chart(fig_bar, use_container_width=True)
     
     with col2:
-        if 'unidade' in df.columns and 'valor estimado' in df.columns and len(df) > 0:
+        if 'unidade' in aggregates and aggregates['has_valor']:
             # Gráfico das maiores coordenadorias por valor estimado
-            unidade_valores = df.groupby('unidade')['valor estimado'].sum().sort_values(ascending=False).head(8)
+            unidade_valores = aggregates['unidade']['valor_sum'].sort_values(ascending=False).head(8)
             
             if len(unidade_valores) > 0:
                 fig_pie = px.pie(
                     values=unidade_valores.values,
-                    names=unidade_valores.index,
+                    names=unidade_valores.index.astype(str),
                     title="💰 Maiores Coordenadorias por Valor Estimado"
                 )
                 fig_pie.update_layout(height=400)
                 st.plotly_chart(fig_pie, use_container_width=True)
     
     # Gráfico temporal se houver dados de data
-    if 'ano' in df.columns and len(df) > 0:
+    if 'ano' in aggregates:
         st.markdown("### 📈 Evolução Temporal")
-        temporal_data = df['ano'].value_counts().sort_index()
+        temporal_data = aggregates['ano']['linhas'].sort_index()
+        temporal_data = temporal_data[temporal_data > 0]
         
         if len(temporal_data) > 0:
             fig_line = px.line(
@@ -390,9 +2303,234 @@ def create_charts(df):
             fig_line.update_layout(height=400)
             st.plotly_chart(fig_line, use_container_width=True)
 
-def display_data_table(df):
-    """Exibe a tabela de dados com opções de visualização"""
+def classification_statistics(aggregates):
+    """Quantidade, valor total, valor médio e pontuação média por classificação"""
+    grouped = aggregates['classificacao_final']
+    grouped = grouped[grouped['linhas'] > 0]
+    
+    classification_stats = pd.DataFrame({
+        'Quantidade': grouped['valor_count'],
+        'Valor Total': grouped['valor_sum'],
+        'Valor Médio': grouped['valor_sum'] / grouped['valor_count'].replace(0, np.nan),
+        'Pontuação Média': grouped['pontuacao_sum'] / grouped['pontuacao_count'].replace(0, np.nan)
+    })
+    return classification_stats.round(2)
+
+# Formatação das colunas numéricas feita no navegador, no formato local do usuário;
+# os valores continuam numéricos (ordenação correta e nenhuma formatação célula a célula)
+NUMBER_COLUMN_CONFIG = {
+    'valor estimado': st.column_config.NumberColumn("valor estimado (R$)", format="localized"),
+    'pontuacao': st.column_config.NumberColumn(format="localized"),
+    'pontuacao_final': st.column_config.NumberColumn(format="localized")
+}
+
+def page_bounds(positions, page_size, anchor=None):
+    """Início e fim da página que começa na linha 'anchor' (ou na seguinte ainda presente)
+    
+    Paginação por chave: a âncora é o identificador da linha, localizado por busca
+    binária nas posições ordenadas, e não um deslocamento.
+    """
+    start = int(np.searchsorted(positions, anchor, side='left')) if anchor is not None else 0
+    start = min(start, max(len(positions) - 1, 0))
+    return start, min(start + page_size, len(positions))
+
+def fetch_window(df, positions, columns, start, end):
+    """Somente as linhas e colunas visíveis da página - custo proporcional ao tamanho da página"""
+    column_indices = [df.columns.get_loc(col) for col in columns]
+    return df.iloc[positions[start:end], column_indices]
+
+def _set_page_anchor(state_key, positions, index):
+    """Callback de navegação: ancora a página na linha da posição 'index'"""
+    index = min(max(index, 0), len(positions) - 1)
+    st.session_state[state_key]['anchor'] = int(positions[index])
+
+def _go_to_page(state_key, positions, page_size):
+    """Callback do campo de página: ancora na primeira linha da página escolhida"""
+    page = st.session_state[f"{state_key}_page"]
+    _set_page_anchor(state_key, positions, (page - 1) * page_size)
+
+def paginate(positions, page_size, state_key, view_key, label="Página"):
+    """Controles de navegação (primeira, anterior, próxima, última, ir para) e janela atual
+    
+    A âncora da página fica no session_state e é reiniciada quando a visão (view_key) muda.
+    Retorna (início, fim) da janela em 'positions'.
+    """
+    state = st.session_state.get(state_key)
+    if state is None or state['view'] != view_key:
+        state = {'view': view_key, 'anchor': None}
+        st.session_state[state_key] = state
+    
+    total_rows = len(positions)
+    start, end = page_bounds(positions, page_size, state['anchor'])
+    total_pages = max((total_rows - 1) // page_size + 1, 1)
+    if total_pages <= 1:
+        return start, end
+    
+    current_page = min(-(-end // page_size), total_pages)
+    st.session_state[f"{state_key}_page"] = current_page
+    col1, col2, col3, col4, col5 = st.columns([1, 1, 2, 1, 1])
+    with col1:
+        st.button("⏮️ Primeira", key=f"{state_key}_first", disabled=start == 0,
+                  on_click=_set_page_anchor, args=(state_key, positions, 0))
+    with col2:
+        st.button("◀️ Anterior", key=f"{state_key}_previous", disabled=start == 0,
+                  on_click=_set_page_anchor, args=(state_key, positions, start - page_size))
+    with col3:
+        st.number_input(
+            f"{label} ({current_page} de {total_pages})",
+            min_value=1,
+            max_value=total_pages,
+            key=f"{state_key}_page",
+            on_change=_go_to_page,
+            args=(state_key, positions, page_size)
+        )
+    with col4:
+        st.button("Próxima ▶️", key=f"{state_key}_next", disabled=end >= total_rows,
+                  on_click=_set_page_anchor, args=(state_key, positions, end))
+    with col5:
+        st.button("Última ⏭️", key=f"{state_key}_last", disabled=end >= total_rows,
+                  on_click=_set_page_anchor, args=(state_key, positions, (total_pages - 1) * page_size))
+    return start, end
+
+# Formatos de exportação: extensão e tipo MIME
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV compactado (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Excel (XLSX)': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+}
+# Linhas por bloco gravado na exportação
+EXPORT_CHUNK_ROWS = 50_000
+# Diretório dos arquivos exportados e tempo de retenção (segundos). Com server.enableStaticServing
+# (.streamlit/config.toml), a pasta static/ ao lado do app é servida em app/static/ direto do disco;
+# os nomes aleatórios dos arquivos não são adivinháveis e eles são removidos após EXPORT_MAX_AGE
+EXPORT_STATIC_PATH = 'exports'
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', EXPORT_STATIC_PATH)
+EXPORT_MAX_AGE = 3600
+# Maior arquivo servido pelo Streamlit a partir de static/ (acima disso, responde 404)
+EXPORT_STATIC_MAX_SIZE = 200 * 1024 * 1024
+# Limite de linhas de uma planilha do Excel (descontando o cabeçalho)
+XLSX_MAX_ROWS = 1_048_575
+
+def prune_exports():
+    """Remove exportações antigas do diretório temporário (chamada a cada rerun: os links expiram)"""
+    for path in glob.glob(os.path.join(EXPORT_DIR, 'editais_*')):
+        try:
+            if time.time() - os.path.getmtime(path) > EXPORT_MAX_AGE:
+                os.remove(path)
+        except OSError:
+            pass
+
+def _export_chunks(df, positions, columns, progress=None):
+    """Blocos de linhas a exportar, lidos da base pelas posições, informando o progresso"""
+    total_rows = len(positions)
+    for start in range(0, total_rows, EXPORT_CHUNK_ROWS):
+        end = min(start + EXPORT_CHUNK_ROWS, total_rows)
+        yield fetch_window(df, positions, columns, start, end)
+        if progress is not None:
+            progress(end / total_rows)
+
+class _SizeLimitedFile(io.FileIO):
+    """Arquivo de saída da exportação que interrompe a gravação ao passar de 'max_size' bytes"""
+    
+    def __init__(self, path, max_size=None):
+        super().__init__(path, 'wb')
+        self.max_size = max_size
+    
+    def write(self, data):
+        if self.max_size is not None and self.tell() + memoryview(data).nbytes > self.max_size:
+            raise ValueError(
+                f"arquivo maior que {format_number_br(self.max_size / 1024 / 1024)} MB: use o formato "
+                "CSV compactado (gzip) ou Parquet, ou refine os filtros"
+            )
+        return super().write(data)
+
+def _write_csv(chunks, f, compress=False):
+    with (gzip.open(f, 'wt', encoding='utf-8', newline='') if compress else io.TextIOWrapper(io.BufferedWriter(f), encoding='utf-8', newline='')) as text:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(text, header=i == 0, index=False)
+
+def _write_parquet(chunks, f):
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                # Colunas sem valores no primeiro bloco são gravadas como texto
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                schema = pa.schema([
+                    field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema
+                ])
+                writer = pq.ParquetWriter(f, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+def _write_xlsx(chunks, f):
+    from openpyxl import Workbook
+    from openpyxl.writer.excel import ExcelWriter
+    
+    # Modo somente escrita: as linhas vão para o disco à medida que são adicionadas
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Editais")
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            sheet.append([str(col) for col in chunk.columns])
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            sheet.append(row)
+    
+    # Equivalente a workbook.save, mantendo o zip acessível para descartá-lo se a gravação falhar
+    archive = zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+    try:
+        ExcelWriter(workbook, archive).save()
+    except Exception:
+        # O arquivo incompleto será removido: o zip é abandonado sem gravar o índice final
+        archive.fp = None
+        raise
+
+def export_rows(df, positions, columns, export_format, progress=None, max_size=None):
+    """Grava as linhas filtradas em um arquivo temporário no formato escolhido, bloco a bloco
+    
+    Apenas um bloco de EXPORT_CHUNK_ROWS linhas fica em memória por vez. Com 'max_size', a
+    gravação é interrompida (ValueError) assim que o arquivo passa desse tamanho. Retorna o
+    caminho do arquivo.
+    """
+    extension, _ = EXPORT_FORMATS[export_format]
+    if extension == 'xlsx' and len(positions) > XLSX_MAX_ROWS:
+        raise ValueError(f"O Excel suporta no máximo {format_number_br(XLSX_MAX_ROWS)} linhas; use CSV ou Parquet")
+    
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix='editais_', suffix=f".{extension}", dir=EXPORT_DIR)
+    os.close(fd)
+    
+    chunks = _export_chunks(df, positions, columns, progress)
+    try:
+        with _SizeLimitedFile(path, max_size) as f:
+            if extension in ('csv', 'csv.gz'):
+                _write_csv(chunks, f, compress=extension == 'csv.gz')
+            elif extension == 'parquet':
+                _write_parquet(chunks, f)
+            else:
+                _write_xlsx(chunks, f)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+def display_data_table(store, positions, view_key=None, data=None, term_matches=None):
+    """Exibe a tabela de dados com opções de visualização
+    
+    'store' contém a base completa e 'positions' as posições das linhas filtradas; apenas a
+    janela da página atual é materializada. 'data' são as medidas da visão filtrada
+    (aggregate_source), das quais sai a matriz de confusão CIC × STI do detalhamento das
+    divergências, calculada só quando ele é exibido; 'term_matches' (busca múltipla)
+    acrescenta a coluna com os termos encontrados em cada linha. Retorna a posição da linha
+    selecionada na tabela, ou None.
+    """
     st.markdown("### 📋 Dados dos Editais")
+    df = store['df']
+    selected_position = None
     
     # Opções de visualização
     col1, col2, col3 = st.columns([2, 1, 1])
@@ -418,127 +2556,406 @@ def display_data_table(df):
     with col2:
         rows_per_page = st.selectbox(
             "📄 Linhas por página",
-            [10, 25, 50, 100],
+            [10, 25, 50, 100, 250, 500, 1000],
             index=1
         )
     
     with col3:
+        export_format = st.selectbox("📁 Formato de exportação", list(EXPORT_FORMATS))
         export_button = st.button("📥 Exportar Filtrados")
     
     if columns_to_show:
-        # Paginação
-        total_rows = len(df)
-        total_pages = (total_rows - 1) // rows_per_page + 1
-        
-        if total_pages > 1:
-            page = st.number_input(
-                f"Página (1 de {total_pages})",
-                min_value=1,
-                max_value=total_pages,
-                value=1
-            ) - 1
-        else:
-            page = 0
-        
-        start_idx = page * rows_per_page
-        end_idx = start_idx + rows_per_page
+        # Paginação sobre as posições das linhas filtradas
+        total_rows = len(positions)
+        start_idx, end_idx = paginate(positions, rows_per_page, 'table_page', view_key)
         
         # Exibir dados
-        display_df = df[columns_to_show].iloc[start_idx:end_idx].copy()
-        
-        # Formatação condicional para valores monetários
-        if 'valor estimado' in display_df.columns:
-            display_df['valor estimado'] = display_df['valor estimado'].apply(
-                lambda x: f"R$ {x:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.') if pd.notna(x) else 'N/A'
-            )
+        display_df = fetch_window(df, positions, columns_to_show, start_idx, end_idx)
+        if term_matches is not None:
+            display_df.insert(0, 'termos encontrados', matched_terms(term_matches, positions[start_idx:end_idx]))
         
-        # Formatação para pontuações
-        for col in ['pontuacao', 'pontuacao_final']:
-            if col in display_df.columns:
-                display_df[col] = display_df[col].apply(
-                    lambda x: f"{x:.2f}" if pd.notna(x) else 'N/A'
-                )
-        
-        # Preenchimento automático para observações em branco
-        if 'observacoes' in display_df.columns:
-            display_df['observacoes'] = display_df['observacoes'].apply(
-                lambda x: x if pd.notna(x) and str(x).strip() != '' else 'Classificação baseada em Termos Chave'
-            )
-        
-        st.dataframe(
+        # Seleção de uma linha (editais semelhantes); a chave muda com a página e a visão
+        table_event = st.dataframe(
             display_df,
+            column_config=NUMBER_COLUMN_CONFIG,
             use_container_width=True,
-            height=400
+            height=400,
+            key=f"table_{hash((view_key, start_idx, end_idx))}",
+            on_select="rerun",
+            selection_mode="single-row"
         )
+        selected_rows = [row for row in table_event.selection.rows if row < end_idx - start_idx]
+        if selected_rows:
+            selected_position = int(positions[start_idx + selected_rows[0]])
         
         # Informações da paginação
-        st.info(f"Exibindo {start_idx + 1}-{min(end_idx, total_rows)} de {total_rows} registros")
+        st.info(f"Exibindo {format_number_br(start_idx + 1)}-{format_number_br(end_idx)} de {format_number_br(total_rows)} registros")
         
         # Checkbox para mostrar apenas divergências
-        if 'Predição CIC' in df.columns and 'Predição STI' in df.columns:
+        divergence_flags = store.get('divergence_flags')
+        if divergence_flags is not None:
             show_only_divergences = st.checkbox(
                 "📊 Exibir apenas divergências entre 'Predição CIC' e 'Predição STI'"
             )
             
             if show_only_divergences:
-                # Filtra apenas as linhas onde as predições são diferentes
-                divergent_df = df[df['Predição CIC'] != df['Predição STI']]
+                # Posições das linhas onde as predições são diferentes (indicador pré-calculado)
+                divergent_positions = positions[divergence_flags[positions]]
                 
-                if len(divergent_df) > 0:
+                if len(divergent_positions) > 0:
                     st.markdown("### 🔍 Divergências Identificadas")
-                    st.info(f"📋 Encontradas {len(divergent_df):,} divergências de {len(df):,} registros ({(len(divergent_df)/len(df)*100):.2f}%)")
-                    
-                    # Recalcula paginação para divergências
-                    div_total_rows = len(divergent_df)
-                    div_total_pages = (div_total_rows - 1) // rows_per_page + 1
+                    st.info(f"📋 Encontradas {format_number_br(len(divergent_positions))} divergências de {format_number_br(total_rows)} registros ({format_share(len(divergent_positions), total_rows)})")
                     
-                    if div_total_pages > 1:
-                        div_page = st.number_input(
-                            f"Página de Divergências (1 de {div_total_pages})",
-                            min_value=1,
-                            max_value=div_total_pages,
-                            value=1,
-                            key="divergences_page"
-                        ) - 1
+                    # Detalhamento por par (Predição CIC, Predição STI)
+                    matrix = confusion_matrix(data) if data is not None else None
+                    pairs = divergent_pairs(matrix)
+                    if len(pairs) > 0:
+                        with st.expander("🧮 Matriz de confusão CIC × STI"):
+                            st.dataframe(matrix, use_container_width=True)
+                        
+                        pair = st.selectbox(
+                            "🔎 Detalhar divergências por par (Predição CIC → Predição STI)",
+                            [None] + pairs.index.tolist(),
+                            format_func=lambda item: "Todas as divergências" if item is None else f"{item[0]} → {item[1]} ({format_number_br(pairs[item])})"
+                        )
+                        if pair is not None:
+                            pair_positions = filter_positions(
+                                df, '', {'Predição CIC': pair[0], 'Predição STI': pair[1]},
+                                filter_bitmaps=store['filter_bitmaps']
+                            )
+                            divergent_positions = np.intersect1d(divergent_positions, pair_positions, assume_unique=True)
                     else:
-                        div_page = 0
+                        pair = None
                     
-                    div_start_idx = div_page * rows_per_page
-                    div_end_idx = div_start_idx + rows_per_page
+                    # Paginação própria para as divergências
+                    div_total_rows = len(divergent_positions)
+                    div_start_idx, div_end_idx = paginate(
+                        divergent_positions, rows_per_page, 'divergences_page', (view_key, pair), "Página de Divergências"
+                    )
                     
                     # Exibir dados de divergências
-                    div_display_df = divergent_df[columns_to_show].iloc[div_start_idx:div_end_idx].copy()
-                    
-                    # Aplicar formatações
-                    if 'valor estimado' in div_display_df.columns:
-                        div_display_df['valor estimado'] = div_display_df['valor estimado'].apply(
-                            lambda x: f"R$ {x:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.') if pd.notna(x) else 'N/A'
-                        )
-                    
-                    if 'observacoes' in div_display_df.columns:
-                        div_display_df['observacoes'] = div_display_df['observacoes'].apply(
-                            lambda x: x if pd.notna(x) and str(x).strip() != '' else 'Classificação baseada em Termos Chave'
-                        )
+                    div_display_df = fetch_window(df, divergent_positions, columns_to_show, div_start_idx, div_end_idx)
                     
                     st.dataframe(
                         div_display_df,
+                        column_config=NUMBER_COLUMN_CONFIG,
                         use_container_width=True,
                         height=400
                     )
                     
-                    st.info(f"Exibindo {div_start_idx + 1}-{min(div_end_idx, div_total_rows)} de {div_total_rows} divergências")
+                    st.info(f"Exibindo {format_number_br(div_start_idx + 1)}-{format_number_br(div_end_idx)} de {format_number_br(div_total_rows)} divergências")
                 else:
                     st.success("✅ Nenhuma divergência encontrada! Todas as predições estão alinhadas.")
         
         # Funcionalidade de exportação
         if export_button:
-            csv = df[columns_to_show].to_csv(index=False)
-            st.download_button(
-                label="📥 Download CSV",
-                data=csv,
-                file_name=f"editais_filtrados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+            progress_bar = st.progress(0.0, text="📥 Exportando...")
+            # Arquivos servidos de static/ têm tamanho máximo: a gravação para ao atingi-lo
+            static_serving = st.get_option('server.enableStaticServing')
+            try:
+                export_path = export_rows(
+                    df, positions, columns_to_show, export_format,
+                    progress=lambda done: progress_bar.progress(done, text=f"📥 Exportando... {done:.0%}"),
+                    max_size=EXPORT_STATIC_MAX_SIZE if static_serving else None
+                )
+            except (ValueError, ImportError, OSError) as e:
+                progress_bar.empty()
+                st.error(f"❌ Erro na exportação: {str(e)}")
+            else:
+                progress_bar.empty()
+                extension, mime = EXPORT_FORMATS[export_format]
+                file_name = f"editais_filtrados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+                if static_serving:
+                    # Link para o arquivo em static/: o download é servido direto do disco
+                    st.markdown(
+                        f'<a href="app/static/{EXPORT_STATIC_PATH}/{os.path.basename(export_path)}" download="{file_name}">'
+                        f'📥 Download {export_format}</a>',
+                        unsafe_allow_html=True
+                    )
+                else:
+                    # Sem o serviço de arquivos estáticos: o download_button carrega o arquivo na memória
+                    with open(export_path, 'rb') as export_file:
+                        st.download_button(
+                            label=f"📥 Download {export_format}",
+                            data=export_file,
+                            file_name=file_name,
+                            mime=mime
+                        )
+                    os.remove(export_path)
+    
+    return selected_position
+
+def show_similar_editais(store, positions, selected_position=None):
+    """Seção de editais semelhantes a um edital selecionado na tabela ou a um texto livre (TF-IDF)"""
+    st.markdown("### 🧬 Editais Semelhantes")
+    if sparse is None:
+        st.info("ℹ️ Instale o pacote scipy para habilitar a busca por editais semelhantes.")
+        return
+    
+    df = store['df']
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        reference = st.radio(
+            "Buscar editais semelhantes a",
+            ["Edital selecionado na tabela", "Texto livre"],
+            horizontal=True,
+            key='similar_reference'
+        )
+    with col2:
+        top_k = st.selectbox("Quantidade de editais", [5, 10, 25, 50], index=1, key='similar_top_k')
+    with col3:
+        only_filtered = st.checkbox("Somente na visão filtrada", key='similar_only_filtered')
+    
+    if not any(col in df.columns for col in SIMILARITY_TEXT_COLUMNS):
+        st.info("ℹ️ A base não possui as colunas 'objeto_processada' ou 'objeto'.")
+        return
+    
+    if reference == "Texto livre":
+        text = st.text_input("📝 Texto de referência", placeholder="Ex.: recapeamento asfáltico de vias urbanas", key='similar_text')
+        if not text.strip():
+            return
+    else:
+        if selected_position is None:
+            st.caption("Selecione uma linha na tabela de editais para ver os mais semelhantes.")
+            return
+        reference_column = 'objeto' if 'objeto' in df.columns else SIMILARITY_TEXT_COLUMNS[0]
+        st.caption(f"📌 Edital de referência: {df[reference_column].iloc[selected_position]}")
+    
+    # Vetores construídos apenas na primeira consulta de cada versão dos dados (depois, vêm do cache)
+    with st.spinner("Preparando vetores TF-IDF..."):
+        similarity_index = build_similarity_index(df, store['version'])
+    if reference == "Texto livre":
+        query, exclude = text_similarity_vector(similarity_index, text), None
+    else:
+        query, exclude = similarity_index['matrix'][[selected_position]], [selected_position]
+    
+    similar_positions, scores = top_similar(
+        similarity_index, query, top_k, allowed=positions if only_filtered else None, exclude=exclude
+    )[0]
+    if len(similar_positions) == 0:
+        st.info("Nenhum edital semelhante encontrado.")
+        return
+    
+    columns = [col for col in SIMILAR_RESULT_COLUMNS if col in df.columns]
+    similar_df = fetch_window(df, similar_positions, columns, 0, len(similar_positions))
+    similar_df.insert(0, 'similaridade', scores)
+    st.dataframe(
+        similar_df,
+        column_config={
+            **NUMBER_COLUMN_CONFIG,
+            'similaridade': st.column_config.ProgressColumn("similaridade", min_value=0.0, max_value=1.0, format="%.2f")
+        },
+        use_container_width=True
+    )
+
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES, show_spinner=False)
+def rules_comparison(_df, dataset_version, rules, filter_key, _positions):
+    """Comparação da classificação por regras com as Predições CIC e STI na visão filtrada
+    
+    Calculada sobre os códigos das categorias e memorizada por (versão dos dados, regras, filtros),
+    de modo que os reruns (paginação, abas) não repetem o trabalho.
+    """
+    result = classify_by_rules(_df, dataset_version, rules)
+    labels = result['labels']
+    rule_categories = labels.categories
+    rule_codes = labels.codes[_positions]
+    
+    comparison = {
+        'total': len(_positions),
+        'unclassified': int((rule_codes == len(rule_categories) - 1).sum()),
+        'changed_cic': None,
+        'agreement_sti': None
+    }
+    
+    if 'Predição CIC' in _df.columns:
+        codes, categories = category_codes(_df['Predição CIC'])
+        # Códigos da CIC traduzidos para as categorias das regras (-1: categoria ausente das regras)
+        cic_codes = np.append(rule_categories.get_indexer(categories.astype(str)), -1)[codes[_positions]]
+        comparison['changed_cic'] = int((rule_codes != cic_codes).sum())
+    
+    if 'Predição STI' not in _df.columns:
+        return comparison
+    
+    codes, sti_categories = category_codes(_df['Predição STI'])
+    sti_codes = codes[_positions]
+    hits = np.append(rule_categories.get_indexer(sti_categories.astype(str)), -1)[sti_codes] == rule_codes
+    comparison['agreement_sti'] = int(hits.sum())
+    
+    # Matriz de confusão Regras × STI por contagem dos pares de códigos (nulos da STI ficam de fora)
+    valid = sti_codes >= 0
+    matrix = np.bincount(
+        rule_codes[valid].astype(np.int64) * len(sti_categories) + sti_codes[valid],
+        minlength=len(rule_categories) * len(sti_categories)
+    ).reshape(len(rule_categories), len(sti_categories))
+    confusion = pd.DataFrame(matrix, index=pd.Index(rule_categories.astype(str), name='Predição Regras'),
+                             columns=pd.Index(sti_categories.astype(str), name='Predição STI'))
+    confusion = confusion.loc[matrix.sum(axis=1) > 0, matrix.sum(axis=0) > 0]
+    
+    # Desempenho por categoria, tomando a Predição STI como referência
+    predicted = pd.Series(np.bincount(rule_codes, minlength=len(rule_categories)), index=rule_categories.astype(str))
+    by_category = pd.DataFrame({
+        'Previstos': predicted,
+        'Predição STI': pd.Series(np.bincount(sti_codes[valid], minlength=len(sti_categories)), index=sti_categories.astype(str)),
+        'Acertos': pd.Series(np.bincount(rule_codes[hits], minlength=len(rule_categories)), index=rule_categories.astype(str))
+    }).fillna(0).astype(int)
+    by_category = by_category[(by_category['Previstos'] > 0) | (by_category['Predição STI'] > 0)]
+    by_category['Precisão'] = by_category['Acertos'] / by_category['Previstos'].where(by_category['Previstos'] > 0)
+    by_category['Cobertura'] = by_category['Acertos'] / by_category['Predição STI'].where(by_category['Predição STI'] > 0)
+    
+    divergent_positions = np.asarray(_positions)[~hits].astype(np.int32)
+    divergent_positions.setflags(write=False)
+    comparison.update({
+        'confusion': confusion,
+        'by_category': by_category.sort_values('Previstos', ascending=False),
+        'divergent_positions': divergent_positions
+    })
+    return comparison
+
+def show_rules_classifier(store, positions, filter_key=None):
+    """Seção do classificador por regras: recalcula a predição da base inteira e compara com a Predição STI"""
+    with st.expander("⚙️ Classificador por Regras (recalcular Predição CIC)"):
+        if sparse is None:
+            st.info("ℹ️ Instale o pacote scipy para habilitar o classificador por regras.")
+            return
+        
+        df = store['df']
+        if not any(col in df.columns for col in SIMILARITY_TEXT_COLUMNS):
+            st.info("ℹ️ A base não possui as colunas 'objeto_processada' ou 'objeto'.")
+            return
+        
+        st.caption(
+            "Regras em JSON: {\"categoria\": {\"termo\": peso}}. Cada termo encontrado em objeto_processada soma "
+            "seu peso à categoria e o edital recebe a categoria de maior pontuação. Use \"prefixo*\" para "
+            "palavras com o mesmo início e termos com espaços para frases. As regras iniciais são sugeridas "
+            "a partir das palavras de objeto_processada mais associadas a cada categoria da Predição CIC."
+        )
+        # O corpo de um expander roda a cada rerun: a classificação só é feita quando solicitada
+        if not st.checkbox("Ativar o classificador por regras", key='rules_enabled'):
+            return
+        
+        with st.spinner("Preparando o classificador..."):
+            suggested = suggest_classification_rules(df, store['version'])
+        rules_text = st.text_area(
+            "📝 Regras de classificação",
+            value=json.dumps(suggested, ensure_ascii=False, indent=2),
+            height=300,
+            key=f"rules_text_{store['version']}"
+        )
+        
+        try:
+            rules = parse_classification_rules(rules_text)
+        except ValueError as error:
+            st.error(f"❌ Regras inválidas: {error}")
+            return
+        
+        with st.spinner("Classificando a base..."):
+            result = classify_by_rules(df, store['version'], rules)
+            comparison = rules_comparison(df, store['version'], rules, filter_key, positions)
+        total = comparison['total']
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if comparison['agreement_sti'] is not None:
+                st.metric("🎯 Concordância com a Predição STI", format_share(comparison['agreement_sti'], total))
+        with col2:
+            if comparison['changed_cic'] is not None:
+                changed = comparison['changed_cic']
+                st.metric("🔄 Alteradas em relação à Predição CIC", format_number_br(changed), delta=format_share(changed, total), delta_color="off")
+        with col3:
+            st.metric("❔ Sem classificação", format_number_br(comparison['unclassified']))
+        
+        if comparison['agreement_sti'] is None:
+            return
+        
+        st.dataframe(
+            comparison['by_category'],
+            column_config={
+                'Precisão': st.column_config.NumberColumn(format="percent"),
+                'Cobertura': st.column_config.NumberColumn(format="percent")
+            },
+            use_container_width=True
+        )
+        
+        with st.expander("🧮 Matriz de confusão Regras × STI"):
+            st.dataframe(comparison['confusion'], use_container_width=True)
+        
+        # Editais em que as regras discordam da Predição STI, com a pontuação obtida
+        divergent_positions = comparison['divergent_positions']
+        if len(divergent_positions) == 0:
+            return
+        st.markdown(f"**Editais em que as regras divergem da Predição STI:** {format_number_br(len(divergent_positions))}")
+        start_idx, end_idx = paginate(
+            divergent_positions, 25, 'rules_page', (store['version'], filter_key, rules), "Página das divergências das regras"
+        )
+        page_positions = divergent_positions[start_idx:end_idx]
+        columns = [col for col in ['objeto', 'Predição CIC', 'Predição STI'] if col in df.columns]
+        page_df = fetch_window(df, divergent_positions, columns, start_idx, end_idx)
+        page_df.insert(0, 'Pontuação Regras', result['scores'][page_positions])
+        page_df.insert(0, 'Predição Regras', np.asarray(result['labels'])[page_positions])
+        st.dataframe(page_df, use_container_width=True)
+
+def show_scope_summary(placeholder, statistics):
+    """Quadro com o escopo da base de dados completa"""
+    placeholder.markdown(f"""
+    <div class="alert-info">
+        <h4>📈 Escopo da Base de Dados Completa</h4>
+        <div style="display: flex; justify-content: space-around; text-align: center; margin: 1rem 0;">
+            <div>
+                <strong style="font-size: 1.5rem; color: #1e40af;">{format_number_br(statistics['total_editais'])}</strong><br>
+                <span style="color: #64748b;">Editais Analisados</span>
+            </div>
+            <div>
+                <strong style="font-size: 1.5rem; color: #1e40af;">{format_brl_compact(statistics['valor_total'])}</strong><br>
+                <span style="color: #64748b;">Valor Total Estimado</span>
+            </div>
+            <div>
+                <strong style="font-size: 1.5rem; color: #1e40af;">{format_number_br(statistics['unidades'])}</strong><br>
+                <span style="color: #64748b;">Unidades Mapeadas</span>
+            </div>
+            <div>
+                <strong style="font-size: 1.5rem; color: #1e40af;">{format_number_br(statistics['categorias'])}</strong><br>
+                <span style="color: #64748b;">Categorias</span>
+            </div>
+            <div>
+                <strong style="font-size: 1.5rem; color: #1e40af;">{format_number_br(statistics['novas_categorias'])}</strong><br>
+                <span style="color: #64748b;">Novas Categorias</span>
+            </div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+def create_categorization_metrics(statistics):
+    """Métricas de editais em múltiplas categorias e em categoria única"""
+    col1, col2 = st.columns(2)
+    total = statistics['total_editais']
+    
+    with col1:
+        multiple = statistics['multiplas_categorias']
+        st.metric(
+            label="📋 Editais em Múltiplas Categorias",
+            value=format_number_br(multiple) if multiple is not None else "—",
+            delta=format_share(multiple, total) if multiple is not None else None
+        )
+    
+    with col2:
+        single = statistics['categoria_unica']
+        st.metric(
+            label="📄 Editais em Categoria Única",
+            value=format_number_br(single) if single is not None else "—",
+            delta=format_share(single, total) if single is not None else None
+        )
+
+def create_divergence_metric(statistics):
+    """Métrica de mudanças entre 'Predição CIC' e 'Predição STI'"""
+    divergences = statistics['divergencias']
+    if divergences is None:
+        return
+    total = statistics['total_editais']
+    st.metric(
+        label="🔄 Mudanças nas Predições",
+        value=f"{format_number_br(divergences / total * 100 if total else 0, 1)}%",
+        delta=f"{format_number_br(divergences)} casos"
+    )
 
 def show_help_tab():
     """Mostra a aba de ajuda e instruções"""
@@ -548,15 +2965,15 @@ def show_help_tab():
     ## 🚀 Início Rápido
     
     ### 1. Escopo da Base de Dados
-    - **52.429 editais** analisados e classificados
-    - **R$ 244 bilhões** em valor total estimado
-    - **729 coordenadorias/unidades** organizacionais mapeadas
+    - **Editais** analisados e classificados pela CIC e pela STI
+    - **Valor total estimado** dos editais, somado a partir da base carregada
+    - **Coordenadorias/unidades** organizacionais mapeadas
     - **14 categorias originais** + **2 novas categorias** criadas
     - Sistema carrega amostras para consulta interativa
     
     ### 2. Dados Automáticos
     - Os dados são carregados automaticamente do SharePoint TCERJ
-    - Sistema atualiza a cada 5 minutos para manter dados frescos
+    - Sistema atualiza a cada 5 minutos em segundo plano, sem interromper a consulta (a versão anterior segue disponível até a nova ficar pronta)
     - Não é necessário fazer upload manual (se configurado corretamente)
     
     ### 3. Navegação
@@ -570,9 +2987,27 @@ def show_help_tab():
     ### Busca por Termo Livre
     - Use a caixa "🔎 Buscar por termo" na barra lateral
     - Busca em múltiplas colunas: objeto, unidade, observações, todos os termos
-    - **Busca múltipla**: Use ponto e vírgula (;) para buscar vários termos
+    - **Busca múltipla**: Use ponto e vírgula (;) para buscar vários termos; a tabela mostra os termos encontrados em cada edital e "Ocorrências por termo" a quantidade de editais de cada um
     - **Exemplo**: "educação; saúde; infraestrutura" busca qualquer um dos termos
-    - **Não diferencia maiúsculas de minúsculas**
+    - **Não diferencia maiúsculas de minúsculas nem acentos** ("saúde" encontra "saude")
+    - **Busca aproximada**: marque "🪄 Busca aproximada" para tolerar erros de digitação e trechos de palavras ("recapiamento asfaltico" encontra "recapeamento asfáltico"); cada palavra do termo precisa aparecer no edital, em qualquer ordem, e a "Similaridade mínima" controla a tolerância
+    
+    ### Editais Semelhantes
+    - Na aba Análise de Dados, selecione uma linha da tabela (ou digite um texto livre) para listar os editais com objeto mais parecido
+    - A similaridade (0 a 1) é o cosseno entre vetores TF-IDF da coluna objeto_processada: palavras raras na base pesam mais
+    - Marque "Somente na visão filtrada" para restringir o resultado aos editais da busca e dos filtros atuais
+    
+    ### Classificador por Regras
+    - Na aba Análise de Dados, o expander "⚙️ Classificador por Regras" recalcula a predição de toda a base a partir de um dicionário {categoria: {termo: peso}} em JSON
+    - Cada termo encontrado em objeto_processada soma seu peso à categoria; vence a de maior pontuação ("prefixo*" aceita variações, termos com espaços são frases)
+    - Marque "Ativar o classificador por regras"; as regras iniciais são sugeridas a partir das palavras de objeto_processada mais associadas a cada categoria da Predição CIC; edite-as e veja na hora a concordância com a Predição STI, o desempenho por categoria e os editais divergentes
+    
+    ### Consultas Estruturadas
+    - **AND**, **OR** e **NOT** (em maiúsculas) combinam termos; termos lado a lado equivalem a AND
+    - **"frase exata"** entre aspas e **parênteses** para agrupar: (merenda OR alimentação) AND escolar
+    - **campo:valor** restringe a busca a uma coluna: objeto, processada, termos, observacoes, situacao, unidade, ente, modalidade, classificacao, cic, sti, ano
+    - **Exemplo**: objeto:"merenda escolar" AND NOT unidade:capital
+    - O expander "🧭 Plano da consulta" mostra como cada parte é resolvida (índice, bitmaps ou busca literal)
     
     ### Exemplos de Busca Múltipla
     - **Por área temática**: "educação; ensino; escola"
@@ -592,17 +3027,17 @@ def show_help_tab():
     ## 📊 Visualizações Disponíveis
     
     ### Métricas Principais
-    - **Total de Editais**: 52.429 editais na base completa
-    - **Valor Total Estimado**: R$ 244 bilhões em investimentos
-    - **Categorias Únicas**: 14 categorias de classificação
-    - **Unidades Únicas**: 729 coordenadorias/unidades mapeadas
+    - **Total de Editais**: quantidade de editais na visão atual (base completa ou filtrada)
+    - **Valor Total Estimado**: soma do valor estimado dos editais exibidos
+    - **Categorias Únicas**: categorias de classificação presentes nos editais exibidos
+    - **Unidades Únicas**: coordenadorias/unidades distintas nos editais exibidos
     
     ### Análise de Categorização
-    - **Editais Complexos**: 8.574 editais em múltiplas categorias (16,35%)
-    - **Editais Simples**: 43.855 editais em categoria única (83,65%)
+    - **Editais Complexos**: editais classificados em múltiplas categorias e sua participação no total
+    - **Editais Simples**: editais com uma única categoria e sua participação no total
     - **Mudanças nas Predições**: Percentual de casos onde Predição CIC difere da Predição STI
     - **Qualidade da Base**: Maioria com classificação única (mais confiável)
-    - **Desafio de Classificação**: 1 em cada 6 editais tem múltiplas categorias
+    - **Desafio de Classificação**: a parcela de editais complexos indica quanto da base exige revisão mais cuidadosa
     - **Análise de Divergências**: Checkbox para visualizar apenas casos com predições diferentes
     
     ### Gráficos Interativos
@@ -615,13 +3050,13 @@ def show_help_tab():
     ### Personalização da Visualização
     - **Colunas Padrão**: Predição CIC, Predição STI, Unidade, Objeto, Valor Estimado, Observações, Todos os Termos
     - **Seleção Personalizada**: Escolha quais campos exibir conforme necessidade
-    - **Paginação**: Configure quantas linhas ver por página (10, 25, 50, 100)
-    - **Exportação**: Baixe os dados filtrados em CSV
-    - **Análise de Divergências**: Checkbox para mostrar apenas casos onde as predições diferem
+    - **Paginação**: Configure quantas linhas ver por página (10 a 1.000)
+    - **Exportação**: Baixe os dados filtrados em CSV, CSV compactado (gzip), Parquet ou Excel (XLSX)
+    - **Análise de Divergências**: Checkbox para mostrar apenas casos onde as predições diferem, com a matriz de confusão CIC × STI e detalhamento por par de classes
     - **Observações Automáticas**: Campos em branco são preenchidos automaticamente com "Classificação baseada em Termos Chave"
     
     ### Formatação Inteligente
-    - Valores monetários formatados automaticamente (R$ 1.234.567,89)
+    - Valores monetários formatados no padrão numérico do navegador (1.234.567,89 em português), na coluna "valor estimado (R$)", sem o prefixo R$ em cada célula; a ordenação da coluna continua numérica
     - Datas em formato brasileiro
     - Navegação intuitiva entre páginas
     - Preenchimento automático de observações em branco
@@ -631,13 +3066,13 @@ def show_help_tab():
     
     ### Para Gestores CIC
     1. **Análise Comparativa**: Compare Predição CIC vs Predição STI para avaliar evolução metodológica
-    2. **Foco em Complexidade**: Concentre-se nos 8.574 editais com múltiplas categorias (16,35%)
+    2. **Foco em Complexidade**: Concentre-se nos editais com múltiplas categorias (Editais Complexos)
     3. **Análise de Divergências**: Use o checkbox para ver apenas casos onde CIC e STI divergem
     4. **Monitoramento de Mudanças**: Acompanhe o percentual de casos com predições diferentes entre as metodologias
     5. **Análise por Coordenadoria**: Monitore performance e volume por unidade organizacional
     6. **Observações Automáticas**: Campos em branco mostram "Classificação baseada em Termos Chave"
     7. **Impacto Financeiro**: Use filtros de valor para focar em editais de maior relevância
-    8. **Qualidade da Base**: Aproveite que 83,65% têm classificação única (mais confiáveis)
+    8. **Qualidade da Base**: Aproveite os editais com classificação única (mais confiáveis)
     
     ### Para Analistas
     1. **Busca nos Termos-Chave**: Use a coluna "todos_termos" para entender critérios de classificação
@@ -646,8 +3081,8 @@ def show_help_tab():
     4. **Comparação de Metodologias**: Analise sistematicamente as diferenças entre as abordagens CIC e STI
     5. **Análise de Observações**: Verifique observações específicas vs classificações automáticas
     6. **Análise de Coordenadorias**: Identifique unidades com mais editais ou maior valor
-    7. **Validação do Modelo**: Foque nos 16,35% complexos para melhorar algoritmos
-    8. **Baseline de Qualidade**: Use os 83,65% simples como referência de classificação correta
+    7. **Validação do Modelo**: Foque nos editais complexos para melhorar algoritmos
+    8. **Baseline de Qualidade**: Use os editais simples como referência de classificação correta
     9. **Dados Limpos**: Sistema remove automaticamente duplicatas para análises mais precisas
     
     ## ⚡ Funcionalidades Avançadas
@@ -685,13 +3120,16 @@ def show_help_tab():
     ---
     
     > 💼 **Projeto Predição de Editais - CIC2025 | TCERJ**  
-    > **📊 Base completa:** 52.429 editais | R$ 244 bilhões | 729 unidades | 14+2 categorias  
+    > **📊 Escopo da base:** editais, valor total e unidades calculados a partir dos dados carregados | 14+2 categorias  
     > Ferramenta de Consulta de Editais | Coordenadoria de Informações Estratégicas
     """)
 
 def main():
     """Função principal da aplicação"""
     
+    # Exportações expiradas saem do diretório servido em app/static/ a cada rerun
+    prune_exports()
+    
     # Header principal
     st.markdown("""
     <div class="main-header">
@@ -716,34 +3154,8 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Estatísticas gerais da base completa
-    st.markdown("""
-    <div class="alert-info">
-        <h4>📈 Escopo da Base de Dados Completa</h4>
-        <div style="display: flex; justify-content: space-around; text-align: center; margin: 1rem 0;">
-            <div>
-                <strong style="font-size: 1.5rem; color: #1e40af;">52.429</strong><br>
-                <span style="color: #64748b;">Editais Analisados</span>
-            </div>
-            <div>
-                <strong style="font-size: 1.5rem; color: #1e40af;">R$ 244 Bilhões</strong><br>
-                <span style="color: #64748b;">Valor Total Estimado</span>
-            </div>
-            <div>
-                <strong style="font-size: 1.5rem; color: #1e40af;">729</strong><br>
-                <span style="color: #64748b;">Unidades Mapeadas</span>
-            </div>
-            <div>
-                <strong style="font-size: 1.5rem; color: #1e40af;">14</strong><br>
-                <span style="color: #64748b;">Categorias</span>
-            </div>
-            <div>
-                <strong style="font-size: 1.5rem; color: #1e40af;">2</strong><br>
-                <span style="color: #64748b;">Novas Categorias</span>
-            </div>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+    # Estatísticas gerais da base completa - preenchidas após o carregamento dos dados
+    scope_placeholder = st.empty()
     
     # Opções de carregamento de dados
     st.markdown("### 📁 Fonte dos Dados")
@@ -755,14 +3167,16 @@ def main():
     
     df = None
     error = None
+    store = None
     
     if data_source == "🔗 SharePoint TCERJ (Automático)":
         # Botão para forçar recarregamento dos dados
         col1, col2, col3 = st.columns([1, 1, 2])
         with col1:
             if st.button("🔄 Recarregar Dados"):
-                st.cache_data.clear()
-                st.rerun()
+                # A atualização roda em segundo plano; a versão atual segue disponível
+                request_sharepoint_refresh()
+                st.toast("🔄 Atualização solicitada - os dados novos aparecem assim que estiverem prontos")
         
         with col2:
             st.markdown("*Atualização automática a cada 5min*")
@@ -771,9 +3185,22 @@ def main():
         st.sidebar.markdown("### 🔗 Status da Conexão")
         st.sidebar.markdown(f"**URL da Planilha:** [Link TCERJ]({SHAREPOINT_URL})")
         
-        # Carregamento dos dados do SharePoint
-        with st.spinner("🔄 Carregando dados do SharePoint TCERJ..."):
-            df, error = load_data_from_sharepoint()
+        # Versão publicada pela thread de atualização; só a primeira carga do processo espera
+        sharepoint_source = get_sharepoint_source()
+        if not sharepoint_source['ready'].is_set():
+            with st.spinner("🔄 Carregando dados do SharePoint TCERJ..."):
+                sharepoint_source['ready'].wait()
+        
+        with sharepoint_source['lock']:
+            df, error, store = sharepoint_source['result'] or (None, sharepoint_source['last_error'] or "Erro inesperado ao carregar a base", None)
+            updated_at = sharepoint_source['updated_at']
+            refresh_error = sharepoint_source['last_error']
+        if updated_at is not None:
+            st.sidebar.markdown(f"**Última atualização:** {updated_at.strftime('%H:%M:%S')}")
+        if sharepoint_source['refreshing']:
+            st.sidebar.markdown("🔄 *Atualizando em segundo plano...*")
+        if df is not None and refresh_error:
+            st.sidebar.warning(f"⚠️ Última atualização falhou; exibindo a versão anterior. {refresh_error}")
     
     else:  # Upload de arquivo
         st.markdown("""
@@ -794,41 +3221,18 @@ def main():
         
         if uploaded_file is not None:
             with st.spinner("🔄 Processando arquivo..."):
-                try:
-                    # Primeira tentativa - encoding UTF-8
-                    df = pd.read_csv(
-                        uploaded_file,
-                        encoding='utf-8',
-                        on_bad_lines='skip',
-                        engine='python',
-                        dtype=str
-                    )
-                    
-                    # Limpeza básica
-                    df = df.dropna(how='all')
-                    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-                    
+                if uploaded_file.size > STREAMING_UPLOAD_THRESHOLD:
+                    # Arquivos grandes: leitura em blocos com memória limitada
+                    file_id = getattr(uploaded_file, 'file_id', f"{uploaded_file.name}:{uploaded_file.size}")
+                    df, error, encoding = load_large_upload(uploaded_file, file_id)
+                else:
+                    df, error, encoding = load_data_from_upload(uploaded_file.getvalue(), uploaded_file.name)
+            
+            if df is not None:
+                if encoding == 'utf-8':
                     st.success(f"✅ Arquivo carregado! {len(df)} linhas encontradas.")
-                    
-                except UnicodeDecodeError:
-                    try:
-                        # Segunda tentativa - encoding latin-1
-                        uploaded_file.seek(0)
-                        df = pd.read_csv(
-                            uploaded_file,
-                            encoding='latin-1',
-                            on_bad_lines='skip',
-                            engine='python',
-                            dtype=str
-                        )
-                        df = df.dropna(how='all')
-                        st.warning(f"⚠️ Arquivo carregado com encoding latin-1. {len(df)} linhas encontradas.")
-                        
-                    except Exception as e2:
-                        error = f"Erro de encoding: {str(e2)}"
-                        
-                except Exception as e:
-                    error = f"Erro ao processar arquivo: {str(e)}"
+                else:
+                    st.warning(f"⚠️ Arquivo carregado com encoding latin-1. {len(df)} linhas encontradas.")
         
         else:
             st.info("👆 Selecione um arquivo CSV para começar a análise")
@@ -917,55 +3321,29 @@ def main():
     
     # Se os dados foram carregados com sucesso
     if df is not None and len(df) > 0:
+        # Base e índices compartilhados pelo processo, construídos uma vez por versão dos dados
+        dataset_version = df.attrs.get('dataset_version') or compute_dataset_version(df)
+        if store is None:
+            store = get_dataset_store(df, dataset_version)
+        base_statistics = store['statistics']
+        show_scope_summary(scope_placeholder, base_statistics)
+        
+        total_editais = base_statistics['total_editais']
+        summary = f"📋 {format_number_br(total_editais)} editais encontrados"
+        if base_statistics['multiplas_categorias'] is not None:
+            multiple = base_statistics['multiplas_categorias']
+            single = base_statistics['categoria_unica']
+            summary += (
+                f" | {format_number_br(multiple)} editais em mais de uma categoria ({format_share(multiple, total_editais)})"
+                f" | {format_number_br(single)} editais em apenas uma categoria ({format_share(single, total_editais)})"
+            )
         st.markdown(f"""
         <div class="alert-success">
             ✅ <strong>Dados carregados com sucesso!</strong><br>
-            📋 52.429 editais encontrados | 8.574 editais em mais de uma categoria (16,35%) | 43.855 editais em apenas uma categoria (83,65%) | 🕐 {datetime.now().strftime('%H:%M:%S')}
+            {summary} | 🕐 {datetime.now().strftime('%H:%M:%S')}
         </div>
         """, unsafe_allow_html=True)
         
-        # Conversões de tipos mais seguras
-        if 'data realizacao licitacao' in df.columns:
-            df['data realizacao licitacao'] = pd.to_datetime(df['data realizacao licitacao'], errors='coerce')
-        
-        if 'ano' in df.columns:
-            df['ano'] = pd.to_numeric(df['ano'], errors='coerce')
-        
-        if 'valor estimado' in df.columns:
-            # Limpeza de valores monetários
-            df['valor estimado'] = df['valor estimado'].astype(str).str.replace(r'[^\d.,]', '', regex=True)
-            df['valor estimado'] = df['valor estimado'].str.replace(',', '.', regex=False)
-            df['valor estimado'] = pd.to_numeric(df['valor estimado'], errors='coerce')
-        
-        if 'pontuacao' in df.columns:
-            df['pontuacao'] = df['pontuacao'].astype(str).str.replace(',', '.', regex=False)
-            df['pontuacao'] = pd.to_numeric(df['pontuacao'], errors='coerce')
-            
-        if 'pontuacao_final' in df.columns:
-            df['pontuacao_final'] = df['pontuacao_final'].astype(str).str.replace(',', '.', regex=False)
-            df['pontuacao_final'] = pd.to_numeric(df['pontuacao_final'], errors='coerce')
-        
-        # Processamento da coluna observacoes - preenche valores em branco
-        if 'observacoes' in df.columns:
-            df['observacoes'] = df['observacoes'].apply(
-                lambda x: x if pd.notna(x) and str(x).strip() != '' else 'Classificação baseada em Termos Chave'
-            )
-        
-        # Renomeação de colunas específicas
-        column_renames = {
-            'classificacao_final - Copiar': 'Predição CIC',
-            'predicao classificacao': 'Predição STI'
-        }
-        
-        for old_name, new_name in column_renames.items():
-            if old_name in df.columns:
-                df = df.rename(columns={old_name: new_name})
-        
-        # Remoção de duplicatas ignorando a coluna 'classificacao_final'
-        columns_for_dedup = [col for col in df.columns if col != 'classificacao_final']
-        if columns_for_dedup:
-            df = df.drop_duplicates(subset=columns_for_dedup, keep='first')
-        
         # Informações dos dados na sidebar
         st.sidebar.markdown("### 📊 Informações dos Dados")
         
@@ -975,10 +3353,27 @@ def main():
         else:
             st.sidebar.markdown("**Fonte:** 📄 Upload Manual 🔵")
         
-        # Informações estatísticas fixas da base completa
-        st.sidebar.markdown("**Total de Editais:** 52.429")
-        st.sidebar.markdown("**Total de Categorias:** 14") 
-        st.sidebar.markdown("**Total Estimado:** R$ 244 bilhões")
+        # Tempo de cada etapa do carregamento (download, leitura e tratamento)
+        load_timings = df.attrs.get('load_timings', [])
+        if load_timings:
+            with st.sidebar.expander("⏱️ Etapas do carregamento"):
+                for stage_name, seconds in load_timings:
+                    st.markdown(f"**{stage_name}:** {seconds * 1000:,.0f} ms")
+                
+                ingestion_report = df.attrs.get('ingestion_report')
+                if ingestion_report:
+                    st.markdown(f"**Engine de leitura:** {ingestion_report['engine']}")
+                    if ingestion_report['recovered']:
+                        st.markdown(f"**Linhas incompletas recuperadas:** {format_number_br(ingestion_report['recovered'])}")
+                    if ingestion_report['skipped']:
+                        st.markdown(f"**Linhas ignoradas:** {format_number_br(ingestion_report['skipped'])}")
+                        for reason, count in ingestion_report['reasons'].items():
+                            st.markdown(f"- {reason}: {format_number_br(count)}")
+        
+        # Informações estatísticas da base completa
+        st.sidebar.markdown(f"**Total de Editais:** {format_number_br(base_statistics['total_editais'])}")
+        st.sidebar.markdown(f"**Total de Categorias:** {format_number_br(base_statistics['categorias'])}")
+        st.sidebar.markdown(f"**Total Estimado:** {format_brl_compact(base_statistics['valor_total'])}")
         
         # **CRIAÇÃO DOS FILTROS**
         st.sidebar.markdown("### 🔍 Filtros de Pesquisa")
@@ -986,12 +3381,24 @@ def main():
         # Filtro por texto livre
         search_term = st.sidebar.text_input(
             "🔎 Buscar por termo (objeto, ente, etc.)",
-            placeholder="Digite aqui para buscar... (use ; para múltiplos termos)"
+            placeholder="Digite aqui para buscar... (use ; para múltiplos termos)",
+            help='Consultas: AND, OR e NOT em maiúsculas, "frase exata", parênteses e campo:valor, '
+                 'ex.: objeto:"merenda escolar" AND NOT unidade:capital'
         )
         
         # Filtros específicos
         filters = {}
         
+        # Busca aproximada: tolera erros de digitação e trechos de palavras
+        if st.sidebar.checkbox("🪄 Busca aproximada", help="Encontra palavras parecidas com as digitadas (ex.: \"asfaltico\" encontra \"asfáltica\")"):
+            filters['similaridade'] = st.sidebar.slider(
+                "Similaridade mínima",
+                min_value=0.6,
+                max_value=1.0,
+                value=FUZZY_DEFAULT_SIMILARITY,
+                step=0.05
+            )
+        
         # Nova Classificação (antes Classificação Final) - PRIMEIRO
         if 'classificacao_final' in df.columns:
             classificacoes = ['Todas'] + sorted(df['classificacao_final'].dropna().unique().tolist())
@@ -1060,8 +3467,25 @@ def main():
                 )
                 filters['valor_range'] = valor_range
         
-        # Aplicação dos filtros
-        filtered_df = apply_filters(df, search_term, filters)
+        # Aplicação dos filtros - resultado reaproveitado entre reruns (paginação, abas) e sessões
+        try:
+            filter_key = canonical_filter_key(search_term, filters, store['value_index'])
+        except ValueError as error:
+            st.sidebar.error(f"❌ Consulta inválida: {error}")
+            search_term = ''
+            filter_key = canonical_filter_key(search_term, filters, store['value_index'])
+        is_query = is_query_key(filter_key[0])
+        similarity = dict(filter_key[1]).get('similaridade')
+        positions = store_filter_positions(store, filter_key)
+        
+        # Medidas da visão filtrada (cubo ou linhas filtradas) e indicadores derivados
+        filtered_data = aggregate_source(store, filter_key, positions)
+        statistics = dataset_statistics(filtered_data, base_statistics['multiplas_categorias'] is not None)
+        
+        # Busca múltipla: linhas de cada termo, da mesma varredura usada no filtro (cache compartilhado)
+        term_matches = None
+        if len(filter_key[0]) > 1 and not is_query and store['search_index'] is not None:
+            term_matches = cached_term_matches(store['search_index'], dataset_version, filter_key[0], similarity)
         
         # Criação das abas após o processamento dos filtros
         tab1, tab2, tab3 = st.tabs(["📊 Análise de Dados", "📈 Dashboard", "📚 Ajuda"])
@@ -1069,151 +3493,110 @@ def main():
         with tab1:
             # Métricas de visão geral
             st.markdown("### 📊 Dados Carregados para Análise")
-            create_overview_metrics(filtered_df)
+            create_overview_metrics(statistics)
             
             # Informações adicionais sobre categorização
             st.markdown("### 📈 Análise de Categorização")
-            col1, col2, col3 = st.columns(3)
+            col1, col2 = st.columns([2, 1])
             
             with col1:
-                st.metric(
-                    label="📋 Editais em Múltiplas Categorias",
-                    value="8.574",
-                    delta="16,35%"
-                )
+                create_categorization_metrics(statistics)
             
             with col2:
-                st.metric(
-                    label="📄 Editais em Categoria Única",
-                    value="43.855", 
-                    delta="83,65%"
-                )
-            
-            with col3:
-                # Calcula % de mudança entre as predições
-                if 'Predição CIC' in filtered_df.columns and 'Predição STI' in filtered_df.columns:
-                    total_linhas = len(filtered_df)
-                    if total_linhas > 0:
-                        linhas_diferentes = len(filtered_df[filtered_df['Predição CIC'] != filtered_df['Predição STI']])
-                        percentual_mudanca = (linhas_diferentes / total_linhas) * 100
-                        
-                        st.metric(
-                            label="🔄 Mudanças nas Predições",
-                            value=f"{percentual_mudanca:.1f}%",
-                            delta=f"{linhas_diferentes:,} casos"
-                        )
-                    else:
-                        st.metric(
-                            label="🔄 Mudanças nas Predições",
-                            value="0%",
-                            delta="0 casos"
-                        )
+                create_divergence_metric(statistics)
             
             # Texto explicativo sobre as mudanças
-            if 'Predição CIC' in filtered_df.columns and 'Predição STI' in filtered_df.columns:
-                total_linhas = len(filtered_df)
-                if total_linhas > 0:
-                    linhas_diferentes = len(filtered_df[filtered_df['Predição CIC'] != filtered_df['Predição STI']])
-                    percentual_mudanca = (linhas_diferentes / total_linhas) * 100
-                    
-                    st.info(f"📊 **Foram identificadas mudanças em {percentual_mudanca:.1f}% dos casos, onde a predição CIC difere da predição STI.**")
+            if statistics['divergencias'] is not None and statistics['total_editais'] > 0:
+                percentual_mudanca = statistics['divergencias'] / statistics['total_editais'] * 100
+                st.info(f"📊 **Foram identificadas mudanças em {format_number_br(percentual_mudanca, 1)}% dos casos, onde a predição CIC difere da predição STI.**")
             
-            if len(filtered_df) == 0:
+            if len(positions) == 0:
                 st.warning("⚠️ Nenhum resultado encontrado com os filtros aplicados. Tente ajustar os critérios de busca.")
             else:
                 # Exibir informações dos filtros aplicados
                 if search_term or any(v not in ['Todas', 'Todos'] for v in filters.values() if isinstance(v, str)):
-                    filter_info = f"🔍 **Filtros aplicados** - Exibindo {len(filtered_df):,} de 52.429 editais"
+                    filter_info = f"🔍 **Filtros aplicados** - Exibindo {format_number_br(len(positions))} de {format_number_br(total_editais)} editais"
                     
                     # Adiciona informação sobre busca múltipla se aplicável
-                    if search_term and ';' in search_term:
+                    if is_query:
+                        filter_info += " | 🧭 Consulta estruturada"
+                    elif search_term and ';' in search_term:
                         terms_count = len([term.strip() for term in search_term.split(';') if term.strip()])
                         filter_info += f" | 🔎 Busca múltipla: {terms_count} termos"
+                    if similarity:
+                        filter_info += f" | 🪄 Busca aproximada (similaridade ≥ {format_number_br(similarity, 2)})"
                     
                     st.info(filter_info)
+                    
+                    if term_matches is not None:
+                        with st.expander("🔎 Ocorrências por termo"):
+                            st.dataframe(term_hit_counts(term_matches, positions, len(df)), hide_index=True, use_container_width=True)
+                    
+                    if is_query:
+                        with st.expander("🧭 Plano da consulta"):
+                            st.code(describe_query_plan(compile_query(parse_query(search_term), df.columns)), language=None)
                 
                 # Tabela de dados
-                display_data_table(filtered_df)
+                selected_position = display_data_table(
+                    store, positions, view_key=(dataset_version, filter_key),
+                    data=filtered_data, term_matches=term_matches
+                )
+                
+                # Editais semelhantes ao selecionado na tabela ou a um texto
+                show_similar_editais(store, positions, selected_position)
+                
+                # Classificação por regras de termos-chave, comparada com a Predição STI
+                show_rules_classifier(store, positions, filter_key)
         
         with tab2:
             st.markdown("### 📊 Dashboard Analítico")
             
-            if len(filtered_df) > 0:
+            if len(positions) > 0:
                 # Mostrar informação de filtros se aplicados
                 if search_term or any(v not in ['Todas', 'Todos'] for v in filters.values() if isinstance(v, str)):
-                    filter_info = f"🔍 **Visualizando dados filtrados** - {len(filtered_df):,} de 52.429 editais"
+                    filter_info = f"🔍 **Visualizando dados filtrados** - {format_number_br(len(positions))} de {format_number_br(total_editais)} editais"
                     
                     # Adiciona informação sobre busca múltipla se aplicável
-                    if search_term and ';' in search_term:
+                    if is_query:
+                        filter_info += " | 🧭 Consulta estruturada"
+                    elif search_term and ';' in search_term:
                         terms_count = len([term.strip() for term in search_term.split(';') if term.strip()])
                         filter_info += f" | 🔎 Busca múltipla: {terms_count} termos"
+                    if similarity:
+                        filter_info += f" | 🪄 Busca aproximada (similaridade ≥ {format_number_br(similarity, 2)})"
                     
                     st.info(filter_info)
                 
                 # Métricas principais
                 st.markdown("### 📊 Dados Filtrados para Análise")
-                create_overview_metrics(filtered_df)
+                create_overview_metrics(statistics)
                 
                 # Informações adicionais sobre categorização
                 st.markdown("### 📈 Análise de Categorização")
-                col1, col2, col3 = st.columns(3)
+                col1, col2 = st.columns([2, 1])
                 
                 with col1:
-                    st.metric(
-                        label="📋 Editais em Múltiplas Categorias",
-                        value="8.574",
-                        delta="16,35%"
-                    )
+                    create_categorization_metrics(statistics)
                 
                 with col2:
-                    st.metric(
-                        label="📄 Editais em Categoria Única",
-                        value="43.855", 
-                        delta="83,65%"
-                    )
-                
-                with col3:
-                    # Calcula % de mudança entre as predições
-                    if 'Predição CIC' in filtered_df.columns and 'Predição STI' in filtered_df.columns:
-                        total_linhas = len(filtered_df)
-                        if total_linhas > 0:
-                            linhas_diferentes = len(filtered_df[filtered_df['Predição CIC'] != filtered_df['Predição STI']])
-                            percentual_mudanca = (linhas_diferentes / total_linhas) * 100
-                            
-                            st.metric(
-                                label="🔄 Mudanças nas Predições",
-                                value=f"{percentual_mudanca:.1f}%",
-                                delta=f"{linhas_diferentes:,} casos"
-                            )
-                        else:
-                            st.metric(
-                                label="🔄 Mudanças nas Predições",
-                                value="0%",
-                                delta="0 casos"
-                            )
+                    create_divergence_metric(statistics)
                 
                 # Texto explicativo sobre as mudanças
-                if 'Predição CIC' in filtered_df.columns and 'Predição STI' in filtered_df.columns:
-                    total_linhas = len(filtered_df)
-                    if total_linhas > 0:
-                        linhas_diferentes = len(filtered_df[filtered_df['Predição CIC'] != filtered_df['Predição STI']])
-                        percentual_mudanca = (linhas_diferentes / total_linhas) * 100
-                        
-                        st.info(f"📊 **Foram identificadas mudanças em {percentual_mudanca:.1f}% dos casos, onde a predição CIC difere da predição STI.**")
+                if statistics['divergencias'] is not None and statistics['total_editais'] > 0:
+                    percentual_mudanca = statistics['divergencias'] / statistics['total_editais'] * 100
+                    st.info(f"📊 **Foram identificadas mudanças em {format_number_br(percentual_mudanca, 1)}% dos casos, onde a predição CIC difere da predição STI.**")
+                
+                # Agregados do dashboard (cubo pré-calculado ou varredura das linhas filtradas)
+                aggregates = dashboard_aggregates(store, filtered_data)
                 
                 # Gráficos
-                create_charts(filtered_df)
+                create_charts(aggregates)
                 
                 # Estatísticas adicionais
-                if 'classificacao_final' in filtered_df.columns:
+                if 'classificacao_final' in aggregates:
                     st.markdown("### 📋 Análise Detalhada por Classificação")
                     
-                    classification_stats = filtered_df.groupby('classificacao_final').agg({
-                        'valor estimado': ['count', 'sum', 'mean'],
-                        'pontuacao': 'mean' if 'pontuacao' in filtered_df.columns else 'count'
-                    }).round(2)
-                    
-                    classification_stats.columns = ['Quantidade', 'Valor Total', 'Valor Médio', 'Pontuação Média']
+                    classification_stats = classification_statistics(aggregates)
                     
                     st.dataframe(
                         classification_stats.sort_values('Quantidade', ascending=False),
@@ -1231,9 +3614,9 @@ def main():
             <h3>👋 Bem-vindo ao Projeto Predição de Editais - CIC2025!</h3>
             <p><strong>📊 Nossa base completa contém:</strong></p>
             <ul style="margin: 1rem 0;">
-                <li><strong>52.429 editais</strong> analisados e classificados</li>
-                <li><strong>R$ 244 bilhões</strong> em valor total estimado</li>
-                <li><strong>729 unidades</strong> organizacionais mapeadas</li>
+                <li><strong>Editais</strong> analisados e classificados</li>
+                <li><strong>Valor total estimado</strong> dos editais</li>
+                <li><strong>Unidades</strong> organizacionais mapeadas</li>
                 <li><strong>14 categorias</strong> originais + <strong>2 novas categorias</strong></li>
             </ul>
             